@@ -4,22 +4,36 @@ Execução: python classificacao_licitacoes.py
 
 Configuração via variáveis de ambiente:
   OPENAI_API_KEY=sk-...
+  PNCP_UFS=SE,AL  PNCP_MODALIDADES=1,6  PNCP_DIAS_POR_CONSULTA, PNCP_MAX_WORKERS
+  OPENAI_BASE_URL, LLM_CONCORRENCIA, LLM_REQUISICOES_POR_MINUTO, LLM_TOKENS_POR_MINUTO (ver motor_llm.py)
+  LLM_CLASSIFICAR_EM_LOTE=1, LLM_TOKENS_POR_LOTE, LLM_MAX_ITENS_POR_LOTE
+  USAR_CLASSIFICADOR_LOCAL=1, LIMIAR_CONFIANCA_LOCAL, CLASSIFICADOR_LOCAL_PATH (ver classificador_local.py)
 """
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
-import time
-from datetime import datetime, timedelta
+import sys
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from urllib.parse import urlparse
 
 import psycopg2
 import requests
-from openai import OpenAI
 from psycopg2.extras import execute_values
 from requests.exceptions import JSONDecodeError as RequestsJSONDecodeError
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "dags"))
+from classificador_local import MIN_EXEMPLOS_LOCAL, ClassificadorLocal  # noqa: E402
+from cliente_http import obter_cliente  # noqa: E402
+from motor_llm import MotorLLM, estimar_tokens  # noqa: E402
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -40,14 +54,30 @@ DATABASE_URL = os.getenv(
 PNCP_BASE_URL = "https://pncp.gov.br/api/consulta/v1/contratacoes/publicacao"
 UF_FILTRO = "SE"
 CODIGO_MODALIDADE_CONTRATACAO = 1
+PNCP_UFS = [uf.strip().upper() for uf in os.getenv("PNCP_UFS", UF_FILTRO).split(",") if uf.strip()]
+PNCP_MODALIDADES = [int(m) for m in os.getenv("PNCP_MODALIDADES", str(CODIGO_MODALIDADE_CONTRATACAO)).split(",") if m.strip()]
 TAMANHO_PAG = 50
 DIAS_JANELA = 365
 PNCP_TIMEOUT = 90
 PNCP_MAX_TENTATIVAS = 3
+PNCP_REQUISICOES_POR_SEGUNDO = 3
+# Uma consulta nunca passa de PNCP_MAX_PAGINAS páginas: janelas maiores são divididas.
+PNCP_MAX_PAGINAS = 20
+PNCP_DIAS_POR_CONSULTA = int(os.getenv("PNCP_DIAS_POR_CONSULTA", "30"))
+PNCP_MAX_WORKERS = int(os.getenv("PNCP_MAX_WORKERS", "4"))
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "COLE_SUA_CHAVE_OPENAI_AQUI")
 OPENAI_MODEL = "gpt-4o-mini"
-BATCH_SIZE = 10
+INTERVALO_PROGRESSO = 10
+# Modo lote: vários objetos por requisição, com as instruções enviadas uma vez só.
+CLASSIFICAR_EM_LOTE = os.getenv("LLM_CLASSIFICAR_EM_LOTE", "1") == "1"
+TOKENS_POR_LOTE = int(os.getenv("LLM_TOKENS_POR_LOTE", "6000"))
+MAX_ITENS_POR_LOTE = int(os.getenv("LLM_MAX_ITENS_POR_LOTE", "30"))
+TOKENS_SAIDA_POR_ITEM = 90
+# Pré-classificador local: objetos previstos com probabilidade acima do limiar não vão ao LLM.
+USAR_CLASSIFICADOR_LOCAL = os.getenv("USAR_CLASSIFICADOR_LOCAL", "1") == "1"
+LIMIAR_CONFIANCA_LOCAL = float(os.getenv("LIMIAR_CONFIANCA_LOCAL", "0.9"))
+MODELO_LOCAL = "sgd-hashing"
 
 CATEGORIAS = [
     "Saúde", "Educação", "Infraestrutura e Obras", "Tecnologia da Informação",
@@ -102,83 +132,346 @@ def criar_tabelas():
             classificado_em      TIMESTAMP DEFAULT NOW()
         );
     """
+    ddl_cache = """
+        CREATE TABLE IF NOT EXISTS cache_classificacoes (
+            chave_objeto        TEXT PRIMARY KEY,
+            categoria           TEXT,
+            confianca           TEXT,
+            objeto_vago         BOOLEAN,
+            justificativa_vago  TEXT,
+            resumo              TEXT,
+            tokens_usados       INTEGER,
+            modelo_usado        TEXT,
+            versao_prompt       TEXT,
+            criado_em           TIMESTAMP DEFAULT NOW()
+        );
+    """
+    # Tabelas criadas antes do cache: ganham as colunas novas e, uma única vez,
+    # perdem as linhas repetidas (fica a mais recente) para aceitar o índice único do upsert.
+    ddl_migracao = """
+        ALTER TABLE licitacoes_classificadas
+            ADD COLUMN IF NOT EXISTS chave_objeto  TEXT,
+            ADD COLUMN IF NOT EXISTS versao_prompt TEXT;
+    """
+    sql_deduplicar = """
+        DELETE FROM licitacoes_classificadas a
+        USING licitacoes_classificadas b
+        WHERE a.numero_controle_pncp = b.numero_controle_pncp AND a.id < b.id;
+    """
     with get_db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(ddl_licitacoes)
             cur.execute(ddl_classificacoes)
+            cur.execute(ddl_cache)
+            cur.execute(ddl_migracao)
+            cur.execute("SELECT to_regclass('licitacoes_classificadas_numero_uq')")
+            if cur.fetchone()[0] is None:
+                cur.execute(sql_deduplicar)
+                logger.info(f"{cur.rowcount} classificações repetidas removidas de licitacoes_classificadas.")
+                cur.execute(
+                    "CREATE UNIQUE INDEX licitacoes_classificadas_numero_uq "
+                    "ON licitacoes_classificadas (numero_controle_pncp)"
+                )
         conn.commit()
     logger.info("Tabelas verificadas/criadas.")
 
 
-# TASK 1 - EXTRAÇÃO
+# CACHE DE CLASSIFICAÇÕES
+
+CAMPOS_CLASSIFICACAO = ("categoria", "confianca", "objeto_vago", "justificativa_vago", "resumo", "modelo_usado")
+
 
-def extrair_licitacoes():
-    hoje = datetime.now()
-    data_fim = hoje.strftime("%Y%m%d")
-    data_ini = (hoje - timedelta(days=DIAS_JANELA)).strftime("%Y%m%d")
+def normalizar_objeto(objeto):
+    # Caixa, espaços e formas Unicode diferentes não mudam o que está sendo comprado.
+    return " ".join(unicodedata.normalize("NFKC", objeto).casefold().split())
 
-    logger.info(f"Buscando licitações PNCP | UF={UF_FILTRO} | {data_ini} -> {data_fim}")
 
-    todas, pagina = [], 1
+def versao_prompt():
+    # Muda sozinha quando as instruções ou as categorias mudam, invalidando o cache.
+    textos = (_montar_prompt("", CATEGORIAS)[0], _montar_prompt_lote([], CATEGORIAS)[0])
+    return hashlib.sha256("\n".join(textos).encode("utf-8")).hexdigest()[:12]
+
+
+def chave_objeto(objeto, modelo=None, versao=None):
+    conteudo = "\x1f".join((normalizar_objeto(objeto), modelo or OPENAI_MODEL, versao or versao_prompt()))
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def buscar_cache(chaves):
+    if not chaves:
+        return {}
+
+    sql = f"SELECT chave_objeto, {', '.join(CAMPOS_CLASSIFICACAO)} FROM cache_classificacoes WHERE chave_objeto = ANY(%s)"
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, (list(chaves),))
+                return {linha[0]: dict(zip(CAMPOS_CLASSIFICACAO, linha[1:])) for linha in cur.fetchall()}
+    except psycopg2.Error as e:
+        logger.warning(f"Cache de classificações indisponível ({e}); classificando tudo pelo LLM.")
+        return {}
+
+
+def guardar_cache(classificacoes):
+    # Só classificações bem-sucedidas têm chave; erros ficam fora para serem refeitos.
+    por_chave = {c["chave_objeto"]: c for c in classificacoes if c.get("chave_objeto")}
+    if not por_chave:
+        return 0
 
-    while True:
-        params = {
-            "dataInicial": data_ini,
-            "dataFinal": data_fim,
-            "codigoModalidadeContratacao": CODIGO_MODALIDADE_CONTRATACAO,
-            "uf": UF_FILTRO,
-            "pagina": pagina,
-            "tamanhoPagina": TAMANHO_PAG,
+    sql = f"""
+        INSERT INTO cache_classificacoes (chave_objeto, {', '.join(CAMPOS_CLASSIFICACAO)}, tokens_usados, versao_prompt)
+        VALUES %s
+        ON CONFLICT (chave_objeto) DO NOTHING
+    """
+    versao = versao_prompt()
+    registros = [
+        (chave, *(c.get(campo) for campo in CAMPOS_CLASSIFICACAO), c.get("tokens_usados", 0), versao)
+        for chave, c in por_chave.items()
+    ]
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, sql, registros, page_size=500)
+            conn.commit()
+    except psycopg2.Error as e:
+        logger.warning(f"Não foi possível gravar o cache de classificações: {e}")
+        return 0
+    return len(registros)
+
+
+# CLASSIFICADOR LOCAL
+
+def atualizar_classificador_local():
+    """Carrega o modelo salvo e treina só com as classificações do LLM gravadas desde o último treino."""
+    classificador = ClassificadorLocal.carregar(CATEGORIAS)
+    # Previsões locais e erros (chave nula) não viram rótulo: o modelo aprende só com o LLM.
+    # Uma linha por chave_objeto, a da primeira classificação: licitações com o mesmo objeto
+    # copiam o rótulo do cache e, repetidas, pesariam mais no treino.
+    sql = """
+        SELECT objeto_compra, categoria, objeto_vago, classificado_em
+        FROM (
+            SELECT DISTINCT ON (chave_objeto) objeto_compra, categoria, objeto_vago, classificado_em
+            FROM licitacoes_classificadas
+            WHERE provider_llm = 'openai' AND chave_objeto IS NOT NULL
+            ORDER BY chave_objeto, classificado_em
+        ) primeiras
+        WHERE classificado_em > %s
+        ORDER BY classificado_em
+    """
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, (classificador.treinado_ate or datetime.min,))
+                linhas = cur.fetchall()
+    except psycopg2.Error as e:
+        logger.warning(f"Não foi possível ler rótulos novos para o classificador local: {e}")
+        return classificador
+
+    if linhas:
+        objetos, categorias, vagos, _ = zip(*linhas)
+        classificador.treinar(list(objetos), list(categorias), [bool(v) for v in vagos])
+        classificador.treinado_ate = linhas[-1][3]
+        classificador.salvar()
+
+    logger.info(f"Classificador local: {len(linhas)} rótulos novos | {classificador.exemplos} exemplos no total")
+    return classificador
+
+
+def _classificar_localmente(itens):
+    classificador = atualizar_classificador_local()
+    if not classificador.pronto:
+        logger.info(f"Classificador local com menos de {MIN_EXEMPLOS_LOCAL} exemplos; todos os objetos vão ao LLM.")
+        return {}
+
+    locais = {}
+    previsoes = classificador.prever([item["objeto_compra"] for item in itens])
+    for item, (categoria, prob_categoria, vago, prob_vago) in zip(itens, previsoes):
+        confianca = min(prob_categoria, prob_vago)
+        if confianca < LIMIAR_CONFIANCA_LOCAL:
+            continue
+
+        # Sem chave: não entra no cache do LLM nem sobrescreve uma classificação do LLM já gravada.
+        locais[item["chave_objeto"]] = {
+            "categoria": categoria,
+            "confianca": "ALTA" if confianca >= 0.95 else "MÉDIA",
+            "objeto_vago": vago,
+            "justificativa_vago": "Semelhante a objetos já classificados como vagos" if vago else "",
+            "resumo": "",
+            "chave_objeto": None,
+            "tokens_usados": 0,
+            "modelo_usado": MODELO_LOCAL,
+            "provider_llm": "local",
         }
-        resp = None
-        for tentativa in range(1, PNCP_MAX_TENTATIVAS + 1):
-            try:
-                resp = requests.get(PNCP_BASE_URL, params=params, timeout=PNCP_TIMEOUT)
-                resp.raise_for_status()
-                break
-            except requests.exceptions.RequestException as e:
-                logger.warning(
-                    f"Tentativa {tentativa}/{PNCP_MAX_TENTATIVAS} falhou na página {pagina}: {e}"
-                )
-                if tentativa == PNCP_MAX_TENTATIVAS:
-                    logger.error(f"Erro definitivo na página {pagina}: {e}")
-                    return todas
-                time.sleep(2)
-
-        if resp.status_code == 204:
-            logger.info(f"Página {pagina} sem resultados para os filtros informados.")
-            break
-
-        try:
-            payload = resp.json()
-        except RequestsJSONDecodeError:
-            content_type = resp.headers.get("Content-Type", "desconhecido")
-            corpo = (resp.text or "").strip().replace("\n", " ")[:300]
-            logger.error(
-                f"Resposta inválida na página {pagina} | status={resp.status_code} "
-                f"| content-type={content_type} | corpo='{corpo}'"
-            )
-            return todas
+    return locais
+
+
+# TASK 1 - EXTRAÇÃO
+
+@dataclass(frozen=True)
+class ConsultaPNCP:
+    uf: str
+    modalidade: int
+    inicio: date
+    fim: date
+
+    @property
+    def dias(self):
+        return (self.fim - self.inicio).days + 1
+
+    def dividir(self):
+        meio = self.inicio + timedelta(days=self.dias // 2 - 1)
+        return (
+            ConsultaPNCP(self.uf, self.modalidade, self.inicio, meio),
+            ConsultaPNCP(self.uf, self.modalidade, meio + timedelta(days=1), self.fim),
+        )
+
+    def rotulo(self):
+        return f"{self.uf}/mod {self.modalidade} {self.inicio:%d/%m/%Y}-{self.fim:%d/%m/%Y}"
 
-        registros = payload.get("data", [])
-        total = payload.get("totalRegistros", 0)
 
-        if pagina == 1:
-            logger.info(f"Total de licitações encontradas: {total}")
-        if not registros:
-            break
+@dataclass
+class CoberturaConsulta:
+    esperados: int = 0
+    obtidos: int = 0
+    paginas: int = 0
+    paginas_com_erro: list = field(default_factory=list)
+    truncada: bool = False
 
-        todas.extend(registros)
-        logger.info(f"Página {pagina} - {len(registros)} registros | acumulado: {len(todas)}")
+    @property
+    def completa(self):
+        return not self.paginas_com_erro and not self.truncada and self.obtidos >= self.esperados
 
-        total_paginas = -(-total // TAMANHO_PAG)
-        if pagina >= total_paginas or pagina >= 20:
-            break
 
-        pagina += 1
-        time.sleep(0.3)
+def _buscar_pagina_pncp(cliente_http, consulta, pagina):
+    """Devolve ``(registros, totalRegistros)`` de uma página; 204 é uma consulta sem resultados."""
+    params = {
+        "dataInicial": consulta.inicio.strftime("%Y%m%d"),
+        "dataFinal": consulta.fim.strftime("%Y%m%d"),
+        "codigoModalidadeContratacao": consulta.modalidade,
+        "uf": consulta.uf,
+        "pagina": pagina,
+        "tamanhoPagina": TAMANHO_PAG,
+    }
+    resp = cliente_http.get(PNCP_BASE_URL, params=params, timeout=PNCP_TIMEOUT, max_tentativas=PNCP_MAX_TENTATIVAS)
+    resp.raise_for_status()
+
+    if resp.status_code == 204:
+        return [], 0
+
+    try:
+        payload = resp.json()
+    except RequestsJSONDecodeError:
+        content_type = resp.headers.get("Content-Type", "desconhecido")
+        corpo = (resp.text or "").strip().replace("\n", " ")[:300]
+        raise ValueError(f"Resposta inválida | status={resp.status_code} | content-type={content_type} | corpo='{corpo}'")
+
+    return payload.get("data", []) or [], int(payload.get("totalRegistros", 0) or 0)
+
+
+def _relatar_cobertura(cobertura, total_bruto, total_unico):
+    por_filtro = {}
+    for consulta, dados in cobertura.items():
+        resumo = por_filtro.setdefault((consulta.uf, consulta.modalidade), [0, 0, 0])
+        resumo[0] += 1
+        resumo[1] += dados.esperados
+        resumo[2] += dados.obtidos
+
+    for (uf, modalidade), (janelas, esperados, obtidos) in sorted(por_filtro.items()):
+        logger.info(f"Cobertura {uf}/mod {modalidade}: {obtidos}/{esperados} registros em {janelas} janelas")
+
+    incompletas = [(consulta, dados) for consulta, dados in cobertura.items() if not dados.completa]
+    for consulta, dados in sorted(incompletas, key=lambda par: (par[0].uf, par[0].modalidade, par[0].inicio)):
+        motivos = []
+        if dados.truncada:
+            motivos.append(f"mais de {PNCP_MAX_PAGINAS} páginas em um único dia")
+        if dados.paginas_com_erro:
+            motivos.append(f"páginas com erro {sorted(dados.paginas_com_erro)}")
+        if dados.obtidos < dados.esperados and not motivos:
+            motivos.append("API devolveu menos registros que o total informado")
+        logger.warning(f"Janela incompleta {consulta.rotulo()}: {dados.obtidos}/{dados.esperados} | {'; '.join(motivos)}")
 
-    logger.info(f"Extração concluída: {len(todas)} licitações")
+    logger.info(
+        f"Cobertura total: {len(cobertura)} janelas, {len(incompletas)} incompletas | "
+        f"{total_bruto} registros baixados, {total_bruto - total_unico} repetidos removidos, {total_unico} únicos"
+    )
+
+
+def extrair_licitacoes(ufs=None, modalidades=None, dias=DIAS_JANELA):
+    """Extrai as licitações de ``dias`` para trás, em consultas por UF, modalidade e subjanela de datas.
+
+    Cada UF x modalidade começa em janelas de ``PNCP_DIAS_POR_CONSULTA`` dias; uma janela
+    cuja primeira página indica mais de ``PNCP_MAX_PAGINAS`` páginas é dividida ao
+    meio até caber. Todas as páginas são buscadas em paralelo (``PNCP_MAX_WORKERS``),
+    respeitando o limite de taxa do host. O resultado é deduplicado por
+    ``numeroControlePNCP`` e a cobertura de cada janela é registrada no log.
+    """
+    ufs = ufs or PNCP_UFS
+    modalidades = modalidades or PNCP_MODALIDADES
+    fim = datetime.now().date()
+    inicio = fim - timedelta(days=dias)
+
+    logger.info(f"Buscando licitações PNCP | UFs={','.join(ufs)} | modalidades={modalidades} | {inicio} -> {fim}")
+
+    cliente_http = obter_cliente()
+    cliente_http.configurar_host(urlparse(PNCP_BASE_URL).netloc, PNCP_REQUISICOES_POR_SEGUNDO)
+
+    consultas = []
+    for uf in ufs:
+        for modalidade in modalidades:
+            janela_inicio = inicio
+            while janela_inicio <= fim:
+                janela_fim = min(janela_inicio + timedelta(days=PNCP_DIAS_POR_CONSULTA - 1), fim)
+                consultas.append(ConsultaPNCP(uf, modalidade, janela_inicio, janela_fim))
+                janela_inicio = janela_fim + timedelta(days=1)
+
+    cobertura = {}
+    unicas, sem_numero, total_bruto = {}, [], 0
+
+    with ThreadPoolExecutor(max_workers=PNCP_MAX_WORKERS) as executor:
+        pendentes = {}
+
+        def agendar(consulta, pagina):
+            pendentes[executor.submit(_buscar_pagina_pncp, cliente_http, consulta, pagina)] = (consulta, pagina)
+
+        for consulta in consultas:
+            agendar(consulta, 1)
+
+        while pendentes:
+            concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for future in concluidos:
+                consulta, pagina = pendentes.pop(future)
+                try:
+                    registros, total = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    logger.error(f"Erro definitivo em {consulta.rotulo()} página {pagina}: {e}")
+                    cobertura.setdefault(consulta, CoberturaConsulta()).paginas_com_erro.append(pagina)
+                    continue
+
+                if pagina == 1:
+                    total_paginas = -(-total // TAMANHO_PAG)
+                    if total_paginas > PNCP_MAX_PAGINAS and consulta.dias > 1:
+                        for metade in consulta.dividir():
+                            agendar(metade, 1)
+                        continue
+
+                    cobertura[consulta] = CoberturaConsulta(esperados=total, truncada=total_paginas > PNCP_MAX_PAGINAS)
+                    for proxima in range(2, min(total_paginas, PNCP_MAX_PAGINAS) + 1):
+                        agendar(consulta, proxima)
+
+                dados = cobertura[consulta]
+                dados.paginas += 1
+                dados.obtidos += len(registros)
+                total_bruto += len(registros)
+                for registro in registros:
+                    numero = registro.get("numeroControlePNCP")
+                    if numero:
+                        unicas.setdefault(numero, registro)
+                    else:
+                        sem_numero.append(registro)
+
+    todas = [*unicas.values(), *sem_numero]
+    _relatar_cobertura(cobertura, total_bruto, len(todas))
+    logger.info(f"Extração concluída: {len(todas)} licitações | {cliente_http.estatisticas.resumo()}")
     return todas
 
 
@@ -253,23 +546,14 @@ def salvar_postgres(licitacoes):
 
 # TASK 3 - CLASSIFICAÇÃO COM OPENAI
 
-def _chamar_openai(prompt_sistema, prompt_usuario):
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": prompt_sistema},
-            {"role": "user", "content": prompt_usuario},
-        ],
-        temperature=0,
-        max_tokens=300,
-        response_format={"type": "json_object"},
-    )
-    return {
-        "conteudo": response.choices[0].message.content,
-        "tokens": response.usage.total_tokens,
-        "modelo": OPENAI_MODEL,
-    }
+_CRITERIOS_CLASSIFICACAO = """CATEGORIAS DISPONÍVEIS:
+{categorias}
+
+CRITÉRIOS PARA objeto_vago=true:
+  - Objeto genérico demais (ex: "aquisição de materiais diversos")
+  - Ausência de especificação do que será adquirido/contratado
+  - Termos vagos como "conforme termo de referência" sem mais detalhes
+  - Descrição com menos de 5 palavras informativas"""
 
 
 def _montar_prompt(objeto, categorias):
@@ -286,14 +570,7 @@ Sua tarefa é analisar o objeto de uma licitação pública e retornar um JSON c
   "resumo":            "1 frase resumindo o objeto em linguagem simples"
 }}
 
-CATEGORIAS DISPONÍVEIS:
-{cats_formatadas}
-
-CRITÉRIOS PARA objeto_vago=true:
-  - Objeto genérico demais (ex: "aquisição de materiais diversos")
-  - Ausência de especificação do que será adquirido/contratado
-  - Termos vagos como "conforme termo de referência" sem mais detalhes
-  - Descrição com menos de 5 palavras informativas
+{_CRITERIOS_CLASSIFICACAO.format(categorias=cats_formatadas)}
 
 REGRAS:
   - Responda APENAS com o JSON, sem texto adicional
@@ -305,6 +582,211 @@ REGRAS:
     return prompt_sistema, prompt_usuario
 
 
+def _montar_prompt_lote(itens, categorias):
+    cats_formatadas = "\n".join(f"  - {c}" for c in categorias)
+    prompt_sistema = f"""Você é um especialista em transparência pública e licitações governamentais brasileiras.
+
+Sua tarefa é analisar os objetos de várias licitações públicas, recebidos como uma lista JSON
+de {{"numero_controle_pncp", "objeto_compra"}}, e retornar um JSON com:
+
+{{
+  "classificacoes": [
+    {{
+      "numero_controle_pncp": "o mesmo numero_controle_pncp recebido",
+      "categoria":         "uma das categorias listadas abaixo",
+      "confianca":         "ALTA | MÉDIA | BAIXA",
+      "objeto_vago":       true | false,
+      "justificativa_vago": "por que é vago (se objeto_vago=true) ou string vazia",
+      "resumo":            "1 frase resumindo o objeto em linguagem simples"
+    }}
+  ]
+}}
+
+{_CRITERIOS_CLASSIFICACAO.format(categorias=cats_formatadas)}
+
+REGRAS:
+  - Responda APENAS com o JSON, sem texto adicional
+  - Um elemento em "classificacoes" para cada objeto recebido, cada um analisado isoladamente
+  - Se não souber a categoria, use "Outros"
+  - Confiança BAIXA quando o objeto for muito vago para classificar
+  - Resumo deve ter no máximo 15 palavras"""
+
+    entrada = [
+        {"numero_controle_pncp": item["numero_controle_pncp"], "objeto_compra": item["objeto_compra"].strip()}
+        for item in itens
+    ]
+    prompt_usuario = f"Analise estes objetos de licitação:\n\n{json.dumps(entrada, ensure_ascii=False)}"
+    return prompt_sistema, prompt_usuario
+
+
+def _montar_lotes(itens, tokens_por_lote=TOKENS_POR_LOTE, max_itens=MAX_ITENS_POR_LOTE):
+    """Agrupa os itens em lotes cujo prompt + resposta esperada cabe em ``tokens_por_lote``.
+
+    As instruções são contadas uma vez por lote; cada item soma o próprio objeto e
+    ``TOKENS_SAIDA_POR_ITEM`` de resposta. Itens sem ``numero_controle_pncp`` ou com
+    número repetido não têm como ser casados com a resposta e vão sozinhos.
+    """
+    fixo = estimar_tokens(_montar_prompt_lote([], CATEGORIAS)[0])
+    lotes, lote, tokens_lote, vistos = [], [], fixo, set()
+
+    for item in itens:
+        numero = item.get("numero_controle_pncp")
+        if not numero or numero in vistos:
+            lotes.append([item])
+            continue
+        vistos.add(numero)
+
+        custo = estimar_tokens(numero, item["objeto_compra"]) + TOKENS_SAIDA_POR_ITEM
+        if lote and (tokens_lote + custo > tokens_por_lote or len(lote) >= max_itens):
+            lotes.append(lote)
+            lote, tokens_lote = [], fixo
+        lote.append(item)
+        tokens_lote += custo
+
+    if lote:
+        lotes.append(lote)
+    return lotes
+
+
+def _extrair_json(conteudo):
+    match = re.search(r"\{.*\}", conteudo.strip(), re.DOTALL)
+    if not match:
+        raise ValueError(f"Nenhum JSON encontrado: {conteudo[:100]}")
+    return json.loads(match.group())
+
+
+def _montar_classificacao(item, dados, tokens, modelo):
+    categoria = dados.get("categoria", "Outros")
+    if categoria not in CATEGORIAS:
+        categoria = "Outros"
+
+    confianca = str(dados.get("confianca", "BAIXA")).upper().replace("MEDIA", "MÉDIA")
+    if confianca not in ("ALTA", "MÉDIA", "BAIXA"):
+        confianca = "BAIXA"
+
+    return {
+        **item,
+        "categoria": categoria,
+        "confianca": confianca,
+        "objeto_vago": bool(dados.get("objeto_vago", False)),
+        "justificativa_vago": dados.get("justificativa_vago", ""),
+        "resumo": dados.get("resumo", ""),
+        "tokens_usados": tokens,
+        "modelo_usado": modelo,
+        "provider_llm": "openai",
+    }
+
+
+def _interpretar_resposta(item, resultado):
+    return _montar_classificacao(item, _extrair_json(resultado["conteudo"]), resultado["tokens"], resultado["modelo"])
+
+
+def _interpretar_lote(lote, resultado):
+    """Devolve ``{numero_controle_pncp: classificacao}`` só para as entradas válidas da resposta.
+
+    Entradas ausentes, repetidas, sem ``categoria`` ou com número desconhecido ficam
+    de fora, e o chamador as reclassifica uma a uma. Os tokens do lote são
+    divididos entre as classificações aproveitadas.
+    """
+    dados = _extrair_json(resultado["conteudo"])
+    entradas = dados.get("classificacoes") if isinstance(dados, dict) else None
+    if not isinstance(entradas, list):
+        raise ValueError(f"Resposta sem a lista 'classificacoes': {resultado['conteudo'][:100]}")
+
+    por_numero = {item["numero_controle_pncp"]: item for item in lote}
+    validas = {}
+    for entrada in entradas:
+        if not isinstance(entrada, dict) or not isinstance(entrada.get("categoria"), str):
+            continue
+        numero = str(entrada.get("numero_controle_pncp", ""))
+        if numero in por_numero and numero not in validas:
+            validas[numero] = entrada
+
+    tokens = resultado["tokens"] // max(len(validas), 1)
+    return {
+        numero: _montar_classificacao(por_numero[numero], entrada, tokens, resultado["modelo"])
+        for numero, entrada in validas.items()
+    }
+
+
+def _classificacao_com_erro(item, erro):
+    return {
+        **item,
+        "categoria": "Outros",
+        "confianca": "BAIXA",
+        "objeto_vago": False,
+        "justificativa_vago": "",
+        "resumo": f"Erro na classificação: {str(erro)[:100]}",
+        "chave_objeto": None,
+        "tokens_usados": 0,
+        "modelo_usado": OPENAI_MODEL,
+        "provider_llm": "openai",
+    }
+
+
+async def _classificar_todos(itens):
+    progresso = {"concluidos": 0, "tokens": 0, "vagos": 0, "erros": 0, "avulsos": 0}
+
+    def registrar(classificacao):
+        progresso["concluidos"] += 1
+        progresso["tokens"] += classificacao["tokens_usados"]
+        progresso["vagos"] += classificacao["objeto_vago"]
+        if progresso["concluidos"] % INTERVALO_PROGRESSO == 0:
+            logger.info(
+                f"  Progresso: {progresso['concluidos']}/{len(itens)} | "
+                f"Tokens: {progresso['tokens']} | Vagos: {progresso['vagos']}"
+            )
+        return classificacao
+
+    async with MotorLLM(OPENAI_API_KEY, OPENAI_MODEL) as motor:
+
+        async def classificar(item):
+            objeto = item["objeto_compra"].strip()
+            try:
+                prompt_sis, prompt_usr = _montar_prompt(objeto, CATEGORIAS)
+                classificacao = _interpretar_resposta(item, await motor.completar(prompt_sis, prompt_usr))
+            except Exception as e:
+                progresso["erros"] += 1
+                logger.error(f"Erro ao classificar '{objeto[:60]}': {e}")
+                classificacao = _classificacao_com_erro(item, e)
+            return registrar(classificacao)
+
+        async def classificar_lote(lote):
+            if len(lote) == 1:
+                return [await classificar(lote[0])]
+
+            try:
+                prompt_sis, prompt_usr = _montar_prompt_lote(lote, CATEGORIAS)
+                resultado = await motor.completar(prompt_sis, prompt_usr, max_tokens=TOKENS_SAIDA_POR_ITEM * len(lote))
+                por_numero = _interpretar_lote(lote, resultado)
+            except Exception as e:
+                logger.warning(f"Lote de {len(lote)} itens sem resposta utilizável ({e}); classificando um a um.")
+                por_numero = {}
+
+            for classificacao in por_numero.values():
+                registrar(classificacao)
+
+            faltantes = [item for item in lote if item["numero_controle_pncp"] not in por_numero]
+            if faltantes and por_numero:
+                logger.warning(f"{len(faltantes)} de {len(lote)} itens ausentes ou inválidos no lote; classificando um a um.")
+            progresso["avulsos"] += len(faltantes)
+
+            avulsos = await asyncio.gather(*(classificar(item) for item in faltantes))
+            por_numero.update(zip((item["numero_controle_pncp"] for item in faltantes), avulsos))
+            return [por_numero[item["numero_controle_pncp"]] for item in lote]
+
+        lotes = _montar_lotes(itens) if CLASSIFICAR_EM_LOTE else [[item] for item in itens]
+        logger.info(f"{len(itens)} itens em {len(lotes)} requisições")
+        resultados = await motor.mapear(classificar_lote, lotes)
+
+    # Itens que foram sozinhos saem da ordem dos lotes; a saída volta à ordem de entrada.
+    por_item = {id(item): c for lote, resultado in zip(lotes, resultados) for item, c in zip(lote, resultado)}
+    classificacoes = [por_item[id(item)] for item in itens]
+
+    logger.info(f"{motor.estatisticas.resumo()} | {progresso['avulsos']} itens reclassificados um a um")
+    return classificacoes, progresso["erros"]
+
+
 def classificar_com_llm(objetos):
     if not objetos:
         logger.warning("Nenhum objeto para classificar.")
@@ -312,69 +794,62 @@ def classificar_com_llm(objetos):
 
     logger.info(f"Classificando {len(objetos)} licitações | Provider: openai | Modelo: {OPENAI_MODEL}")
 
-    classificacoes, erros, tokens_total = [], 0, 0
+    versao = versao_prompt()
+    itens = [
+        {**item, "chave_objeto": chave_objeto(item["objeto_compra"], OPENAI_MODEL, versao), "versao_prompt": versao}
+        for item in objetos
+        if len((item.get("objeto_compra") or "").strip()) >= 5
+    ]
+
+    # Objetos já classificados (nesta ou em outra licitação) vêm do cache; cada objeto
+    # novo passa pelo classificador local e, se ele não tiver confiança, o primeiro
+    # item com aquele objeto vai ao LLM e os repetidos herdam a resposta.
+    cache = buscar_cache({item["chave_objeto"] for item in itens})
+    pendentes = {}
+    for item in itens:
+        if item["chave_objeto"] not in cache:
+            pendentes.setdefault(item["chave_objeto"], item)
+    pendentes = list(pendentes.values())
+    em_cache = sum(item["chave_objeto"] in cache for item in itens)
+    logger.info(
+        f"Cache: {em_cache} de {len(itens)} itens já classificados | "
+        f"{len(pendentes)} objetos novos (prompt {versao})"
+    )
 
-    for i, item in enumerate(objetos):
-        objeto = item.get("objeto_compra", "").strip()
-        if not objeto or len(objeto) < 5:
+    locais = _classificar_localmente(pendentes) if USAR_CLASSIFICADOR_LOCAL and pendentes else {}
+    para_llm = [item for item in pendentes if item["chave_objeto"] not in locais]
+    if locais:
+        requisicoes = (lambda lista: len(_montar_lotes(lista))) if CLASSIFICAR_EM_LOTE else len
+        logger.info(
+            f"Classificador local: {len(locais)} de {len(pendentes)} objetos novos resolvidos "
+            f"(limiar {LIMIAR_CONFIANCA_LOCAL}) | {requisicoes(pendentes) - requisicoes(para_llm)} chamadas ao LLM evitadas"
+        )
+
+    # As chamadas correm em paralelo (limitadas pelo motor); a saída segue a ordem de ``objetos``.
+    novas, erros = asyncio.run(_classificar_todos(para_llm)) if para_llm else ([], 0)
+    guardar_cache(novas)
+
+    primeiras = {item["chave_objeto"]: (item, c) for item, c in zip(para_llm, novas)}
+    classificacoes = []
+    for item in itens:
+        if item["chave_objeto"] in cache:
+            classificacoes.append({**item, **cache[item["chave_objeto"]], "tokens_usados": 0, "provider_llm": "openai"})
+            continue
+        if item["chave_objeto"] in locais:
+            classificacoes.append({**item, **locais[item["chave_objeto"]]})
             continue
 
-        try:
-            prompt_sis, prompt_usr = _montar_prompt(objeto, CATEGORIAS)
-            resultado = _chamar_openai(prompt_sis, prompt_usr)
-
-            match = re.search(r"\{.*\}", resultado["conteudo"].strip(), re.DOTALL)
-            if not match:
-                raise ValueError(f"Nenhum JSON encontrado: {resultado['conteudo'][:100]}")
-
-            dados = json.loads(match.group())
-            categoria = dados.get("categoria", "Outros")
-            if categoria not in CATEGORIAS:
-                categoria = "Outros"
-
-            confianca = dados.get("confianca", "BAIXA").upper().replace("MEDIA", "MÉDIA")
-            if confianca not in ("ALTA", "MÉDIA", "BAIXA"):
-                confianca = "BAIXA"
-
-            classificacoes.append({
-                **item,
-                "categoria": categoria,
-                "confianca": confianca,
-                "objeto_vago": bool(dados.get("objeto_vago", False)),
-                "justificativa_vago": dados.get("justificativa_vago", ""),
-                "resumo": dados.get("resumo", ""),
-                "tokens_usados": resultado["tokens"],
-                "modelo_usado": resultado["modelo"],
-                "provider_llm": "openai",
-            })
-            tokens_total += resultado["tokens"]
-
-            if (i + 1) % 10 == 0:
-                vagos_ate_agora = sum(1 for c in classificacoes if c["objeto_vago"])
-                logger.info(f"  Progresso: {i+1}/{len(objetos)} | Tokens: {tokens_total} | Vagos: {vagos_ate_agora}")
-
-        except Exception as e:
-            erros += 1
-            logger.error(f"[{i+1}] Erro ao classificar '{objeto[:60]}': {e}")
-            classificacoes.append({
-                **item,
-                "categoria": "Outros",
-                "confianca": "BAIXA",
-                "objeto_vago": False,
-                "justificativa_vago": "",
-                "resumo": f"Erro na classificação: {str(e)[:100]}",
-                "tokens_usados": 0,
-                "modelo_usado": OPENAI_MODEL,
-                "provider_llm": "openai",
-            })
-
-        if (i + 1) % BATCH_SIZE == 0:
-            time.sleep(1)
+        primeiro, classificacao = primeiras[item["chave_objeto"]]
+        if item is not primeiro:
+            # Mesmo objeto repetido na execução: herda a resposta sem contar os tokens de novo.
+            classificacao = {**classificacao, **item, "chave_objeto": classificacao["chave_objeto"], "tokens_usados": 0}
+        classificacoes.append(classificacao)
+    tokens_total = sum(c["tokens_usados"] for c in classificacoes)
 
     vagos = sum(1 for c in classificacoes if c.get("objeto_vago"))
     logger.info(
         f"Classificação concluída: {len(classificacoes)} | "
-        f"Vagos: {vagos} ({vagos/len(classificacoes)*100:.1f}%) | "
+        f"Vagos: {vagos} ({vagos/max(len(classificacoes), 1)*100:.1f}%) | "
         f"Erros: {erros} | Tokens: {tokens_total}"
     )
     return classificacoes
@@ -387,14 +862,37 @@ def salvar_classificacoes(classificacoes):
         logger.info("Nenhuma classificação para salvar.")
         return 0
 
-    #sql_truncate = "TRUNCATE TABLE licitacoes_classificadas RESTART IDENTITY;"
-    sql_insert = """
+    # Uma linha por licitação: reclassificar atualiza a linha existente, e só quando
+    # a classificação mudou (outro objeto, modelo ou prompt, ou um erro anterior).
+    # Um erro (chave nula) nunca sobrescreve uma classificação já gravada.
+    sql_upsert = """
         INSERT INTO licitacoes_classificadas (
             numero_controle_pncp, objeto_compra, orgao_nome, uf,
             categoria, confianca, objeto_vago, justificativa_vago,
-            resumo, tokens_usados, modelo_usado, provider_llm, data_publicacao
+            resumo, tokens_usados, modelo_usado, provider_llm, data_publicacao,
+            chave_objeto, versao_prompt
         ) VALUES %s
+        ON CONFLICT (numero_controle_pncp) DO UPDATE SET
+            objeto_compra      = EXCLUDED.objeto_compra,
+            orgao_nome         = EXCLUDED.orgao_nome,
+            uf                 = EXCLUDED.uf,
+            categoria          = EXCLUDED.categoria,
+            confianca          = EXCLUDED.confianca,
+            objeto_vago        = EXCLUDED.objeto_vago,
+            justificativa_vago = EXCLUDED.justificativa_vago,
+            resumo             = EXCLUDED.resumo,
+            tokens_usados      = EXCLUDED.tokens_usados,
+            modelo_usado       = EXCLUDED.modelo_usado,
+            provider_llm       = EXCLUDED.provider_llm,
+            data_publicacao    = EXCLUDED.data_publicacao,
+            chave_objeto       = EXCLUDED.chave_objeto,
+            versao_prompt      = EXCLUDED.versao_prompt,
+            classificado_em    = NOW()
+        WHERE EXCLUDED.chave_objeto IS NOT NULL
+          AND licitacoes_classificadas.chave_objeto IS DISTINCT FROM EXCLUDED.chave_objeto
     """
+    # O mesmo número duas vezes no mesmo INSERT quebraria o ON CONFLICT; fica a última.
+    por_numero = {c.get("numero_controle_pncp") or id(c): c for c in classificacoes}
     registros = [
         (
             c.get("numero_controle_pncp"),
@@ -410,18 +908,21 @@ def salvar_classificacoes(classificacoes):
             c.get("modelo_usado"),
             c.get("provider_llm"),
             c.get("data_publicacao"),
+            c.get("chave_objeto"),
+            c.get("versao_prompt"),
         )
-        for c in classificacoes
+        for c in por_numero.values()
     ]
 
     with get_db_connection() as conn:
         with conn.cursor() as cur:
-            #cur.execute(sql_truncate)
-            execute_values(cur, sql_insert, registros)
+            # Uma página só, para o rowcount contar todas as linhas gravadas.
+            execute_values(cur, sql_upsert, registros, page_size=len(registros))
+            gravadas = cur.rowcount
         conn.commit()
 
     vagos = sum(1 for c in classificacoes if c.get("objeto_vago"))
-    logger.info(f"{len(registros)} classificações salvas | {vagos} objetos vagos.")
+    logger.info(f"{len(registros)} classificações | {gravadas} novas ou alteradas | {vagos} objetos vagos.")
     return len(registros)
 
 
@@ -0,0 +1,97 @@
+"""
+Pré-classificador local de objetos de licitação, treinado com as classificações já feitas pelo LLM.
+Roda só em CPU: vetores por hashing (sem vocabulário para guardar) e modelos lineares
+treinados com partial_fit, então cada execução aprende só com os rótulos novos.
+"""
+
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+CLASSIFICADOR_LOCAL_PATH = os.getenv("CLASSIFICADOR_LOCAL_PATH", "/tmp/classificador_licitacoes.pkl")
+MIN_EXEMPLOS_LOCAL = int(os.getenv("MIN_EXEMPLOS_LOCAL", "500"))
+EPOCAS_TREINO_INICIAL = 5
+
+
+class ClassificadorLocal:
+    """Categoria e ``objeto_vago`` previstos por dois SGDClassifier (regressão logística) sobre n-gramas.
+
+    ``prever`` devolve a probabilidade de cada previsão; quem chama decide o limiar
+    a partir do qual a resposta local substitui a chamada ao LLM.
+    """
+
+    def __init__(self, categorias: list[str]) -> None:
+        self.categorias = list(categorias)
+        self.vetorizador = HashingVectorizer(
+            n_features=2**18, ngram_range=(1, 2), strip_accents="unicode", alternate_sign=False, norm="l2"
+        )
+        self.modelo_categoria = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+        self.modelo_vago = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+        self.exemplos = 0
+        # Marca d'água do treino incremental: maior ``classificado_em`` já aprendido.
+        self.treinado_ate = None
+
+    @property
+    def pronto(self) -> bool:
+        return self.exemplos >= MIN_EXEMPLOS_LOCAL
+
+    def treinar(self, objetos: list[str], categorias: list[str], vagos: list[bool]) -> None:
+        if not objetos:
+            return
+
+        matriz = self.vetorizador.transform(objetos)
+        rotulos = np.array([c if c in self.categorias else "Outros" for c in categorias])
+        vagos = np.array(vagos, dtype=bool)
+
+        # O primeiro lote passa algumas vezes pelos modelos; os seguintes, uma vez só.
+        epocas = EPOCAS_TREINO_INICIAL if self.exemplos == 0 else 1
+        embaralhar = np.random.default_rng(self.exemplos)
+        for _ in range(epocas):
+            ordem = embaralhar.permutation(len(objetos))
+            self.modelo_categoria.partial_fit(matriz[ordem], rotulos[ordem], classes=self.categorias)
+            self.modelo_vago.partial_fit(matriz[ordem], vagos[ordem], classes=[False, True])
+
+        self.exemplos += len(objetos)
+
+    def prever(self, objetos: list[str]) -> list[tuple[str, float, bool, float]]:
+        """``(categoria, probabilidade, objeto_vago, probabilidade)`` para cada objeto."""
+        if not objetos:
+            return []
+
+        matriz = self.vetorizador.transform(objetos)
+        prob_categoria = self.modelo_categoria.predict_proba(matriz)
+        prob_vago = self.modelo_vago.predict_proba(matriz)
+        indice_vago = list(self.modelo_vago.classes_).index(True)
+
+        previsoes = []
+        for linha_categoria, linha_vago in zip(prob_categoria, prob_vago):
+            melhor = int(linha_categoria.argmax())
+            vago = bool(linha_vago[indice_vago] >= 0.5)
+            previsoes.append((
+                str(self.modelo_categoria.classes_[melhor]),
+                float(linha_categoria[melhor]),
+                vago,
+                float(linha_vago[indice_vago] if vago else 1 - linha_vago[indice_vago]),
+            ))
+        return previsoes
+
+    def salvar(self, caminho: str = CLASSIFICADOR_LOCAL_PATH) -> None:
+        # Grava num arquivo temporário e troca no fim: um processo interrompido não deixa modelo pela metade.
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{caminho}.tmp", "wb") as arquivo:
+            pickle.dump(self, arquivo)
+        os.replace(f"{caminho}.tmp", caminho)
+
+    @classmethod
+    def carregar(cls, categorias: list[str], caminho: str = CLASSIFICADOR_LOCAL_PATH) -> "ClassificadorLocal":
+        # Modelo treinado com outra lista de categorias não serve: recomeça do zero.
+        if os.path.exists(caminho):
+            with open(caminho, "rb") as arquivo:
+                modelo = pickle.load(arquivo)
+            if isinstance(modelo, cls) and modelo.categorias == list(categorias):
+                return modelo
+        return cls(categorias)
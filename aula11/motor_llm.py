@@ -0,0 +1,165 @@
+"""
+Motor assíncrono de chamadas ao LLM: um único cliente AsyncOpenAI, concorrência limitada
+e orçamento de requisições e tokens por minuto.
+
+Configuração via variáveis de ambiente:
+  OPENAI_BASE_URL=http://127.0.0.1:8001/v1   (opcional, ex.: servidor de openai_falso.py)
+  LLM_CONCORRENCIA, LLM_REQUISICOES_POR_MINUTO, LLM_TOKENS_POR_MINUTO, LLM_MAX_TENTATIVAS
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, TypeVar
+
+from openai import AsyncOpenAI
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_CONCORRENCIA = int(os.getenv("LLM_CONCORRENCIA", "8"))
+LLM_REQUISICOES_POR_MINUTO = int(os.getenv("LLM_REQUISICOES_POR_MINUTO", "500"))
+LLM_TOKENS_POR_MINUTO = int(os.getenv("LLM_TOKENS_POR_MINUTO", "200000"))
+LLM_MAX_TENTATIVAS = int(os.getenv("LLM_MAX_TENTATIVAS", "5"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Estimativa conservadora para português; o valor real vem do ``usage`` da resposta.
+CARACTERES_POR_TOKEN = 3
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def estimar_tokens(*textos: str) -> int:
+    return sum(len(texto) for texto in textos) // CARACTERES_POR_TOKEN + 1
+
+
+class OrcamentoPorMinuto:
+    """Token bucket assíncrono: ``limite`` unidades por minuto, com rajada de até um minuto de orçamento.
+
+    Os pedidos são atendidos em ordem de chegada (quem espera segura o lock), então
+    uma requisição grande não é ultrapassada indefinidamente pelas pequenas.
+    """
+
+    def __init__(self, limite: float) -> None:
+        self.limite = limite
+        self.taxa = limite / 60
+        self._disponivel = float(limite)
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def consumir(self, quantidade: float) -> float:
+        if self.limite <= 0:
+            return 0.0
+
+        # Um pedido maior que o orçamento inteiro nunca caberia; ele espera o balde encher.
+        quantidade = min(quantidade, self.limite)
+        espera_total = 0.0
+
+        async with self._lock:
+            while True:
+                self._repor()
+                if self._disponivel >= quantidade:
+                    self._disponivel -= quantidade
+                    return espera_total
+
+                espera = (quantidade - self._disponivel) / self.taxa
+                await asyncio.sleep(espera)
+                espera_total += espera
+
+    def ajustar(self, diferenca: float) -> None:
+        # Corrige a estimativa com o consumo real; o saldo pode ficar negativo e
+        # atrasar os próximos pedidos, como o limite do provedor faria.
+        if self.limite > 0:
+            self._repor()
+            self._disponivel = min(self.limite, self._disponivel - diferenca)
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self._disponivel = min(self.limite, self._disponivel + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+
+@dataclass
+class EstatisticasLLM:
+    requisicoes: int = 0
+    tokens: int = 0
+    espera_orcamento: float = 0.0
+    tempo_total: float = 0.0
+
+    def resumo(self) -> str:
+        por_minuto = 60 / self.tempo_total if self.tempo_total else 0.0
+        return (
+            f"LLM: {self.requisicoes} requisicoes | {self.tokens} tokens | "
+            f"{self.requisicoes * por_minuto:.0f} req/min, {self.tokens * por_minuto:.0f} tokens/min | "
+            f"espera no orcamento={self.espera_orcamento:.1f}s | {self.tempo_total:.1f}s"
+        )
+
+
+class MotorLLM:
+    """Cliente AsyncOpenAI compartilhado com no máximo ``concorrencia`` chamadas em andamento.
+
+    Antes de cada chamada o motor reserva uma requisição do orçamento por minuto e
+    os tokens estimados do prompt mais ``max_tokens``; 429 e erros 5xx são
+    retentados pelo próprio cliente, com backoff e respeitando o Retry-After.
+    Deve ser criado dentro do event loop que vai usá-lo (``async with MotorLLM(...)``).
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        modelo: str,
+        concorrencia: int = LLM_CONCORRENCIA,
+        requisicoes_por_minuto: int = LLM_REQUISICOES_POR_MINUTO,
+        tokens_por_minuto: int = LLM_TOKENS_POR_MINUTO,
+        base_url: str | None = OPENAI_BASE_URL,
+        max_tentativas: int = LLM_MAX_TENTATIVAS,
+        timeout: float = LLM_TIMEOUT,
+    ) -> None:
+        self.modelo = modelo
+        self.cliente = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=max_tentativas, timeout=timeout)
+        self.estatisticas = EstatisticasLLM()
+        self._semaforo = asyncio.Semaphore(max(concorrencia, 1))
+        self._requisicoes = OrcamentoPorMinuto(requisicoes_por_minuto)
+        self._tokens = OrcamentoPorMinuto(tokens_por_minuto)
+        self._inicio = time.perf_counter()
+
+    async def __aenter__(self) -> "MotorLLM":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.estatisticas.tempo_total = time.perf_counter() - self._inicio
+        await self.cliente.close()
+
+    async def completar(self, prompt_sistema: str, prompt_usuario: str, max_tokens: int = 300) -> dict:
+        estimativa = estimar_tokens(prompt_sistema, prompt_usuario) + max_tokens
+
+        async with self._semaforo:
+            espera = await self._requisicoes.consumir(1)
+            espera += await self._tokens.consumir(estimativa)
+
+            response = await self.cliente.chat.completions.create(
+                model=self.modelo,
+                messages=[
+                    {"role": "system", "content": prompt_sistema},
+                    {"role": "user", "content": prompt_usuario},
+                ],
+                temperature=0,
+                max_tokens=max_tokens,
+                response_format={"type": "json_object"},
+            )
+
+        tokens = response.usage.total_tokens if response.usage else estimativa
+        self._tokens.ajustar(tokens - estimativa)
+        self.estatisticas.requisicoes += 1
+        self.estatisticas.tokens += tokens
+        self.estatisticas.espera_orcamento += espera
+
+        return {
+            "conteudo": response.choices[0].message.content or "",
+            "tokens": tokens,
+            "modelo": self.modelo,
+        }
+
+    async def mapear(self, funcao: Callable[[T], Awaitable[R]], itens: Iterable[T]) -> list[R]:
+        # gather devolve os resultados na ordem dos itens, não na ordem de término.
+        return await asyncio.gather(*(funcao(item) for item in itens))
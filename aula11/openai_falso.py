@@ -0,0 +1,243 @@
+"""
+Servidor local compatível com a API de chat completions da OpenAI, para testar a
+classificação sem chave nem custo.
+Execução: python openai_falso.py [--porta 8001] [--latencia-ms 300] [--rpm 0]
+          OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python aula11.py
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+CARACTERES_POR_TOKEN = 4
+
+PALAVRAS_CATEGORIA = {
+    "Saúde": ("medicamento", "hospital", "saude", "odontolog", "ambulancia"),
+    "Educação": ("escola", "escolar", "ensino", "educacao", "didatic"),
+    "Infraestrutura e Obras": ("obra", "pavimentacao", "construcao", "reforma", "engenharia"),
+    "Tecnologia da Informação": ("software", "computador", "informatica", "sistema", "rede"),
+    "Alimentação e Nutrição": ("alimento", "merenda", "generos alimenticios", "refeic"),
+    "Segurança Pública": ("viatura", "policia", "vigilancia", "seguranca"),
+    "Meio Ambiente e Saneamento": ("saneamento", "residuo", "lixo", "agua", "esgoto"),
+    "Transporte e Logística": ("transporte", "combustivel", "veiculo", "frete"),
+    "Administrativo e Material de Escritório": ("expediente", "escritorio", "papel", "toner"),
+    "Serviços Gerais": ("limpeza", "manutencao", "conservacao", "locacao"),
+}
+
+
+def _normalizar(texto: str) -> str:
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return sem_acento.lower()
+
+
+def classificar_por_palavras(objeto: str) -> dict:
+    normalizado = _normalizar(objeto)
+    categoria = next(
+        (cat for cat, palavras in PALAVRAS_CATEGORIA.items() if any(p in normalizado for p in palavras)),
+        "Outros",
+    )
+    vago = len(normalizado.split()) < 5 or "diversos" in normalizado
+    return {
+        "categoria": categoria,
+        "confianca": "BAIXA" if vago else ("ALTA" if categoria != "Outros" else "MÉDIA"),
+        "objeto_vago": vago,
+        "justificativa_vago": "Descrição genérica" if vago else "",
+        "resumo": " ".join(objeto.split()[:15]),
+    }
+
+
+def responder_classificacao(mensagens: list[dict]) -> str:
+    """Classifica por palavras-chave o objeto entre aspas na última mensagem do usuário.
+
+    Se a mensagem trouxer uma lista JSON de objetos (prompt em lote), responde
+    ``{"classificacoes": [...]}`` com um elemento por ``numero_controle_pncp``.
+    """
+    usuario = next((m["content"] for m in reversed(mensagens) if m.get("role") == "user"), "")
+
+    lista = re.search(r"\[.*\]", usuario, re.DOTALL)
+    if lista:
+        itens = json.loads(lista.group())
+        classificacoes = [
+            {"numero_controle_pncp": item["numero_controle_pncp"], **classificar_por_palavras(item["objeto_compra"])}
+            for item in itens
+        ]
+        return json.dumps({"classificacoes": classificacoes}, ensure_ascii=False)
+
+    match = re.search(r'"(.*)"', usuario, re.DOTALL)
+    return json.dumps(classificar_por_palavras(match.group(1) if match else usuario), ensure_ascii=False)
+
+
+class ServidorOpenAIFalso:
+    """``POST /v1/chat/completions`` em processo, com latência e limite de requisições por minuto.
+
+    Acima de ``requisicoes_por_minuto`` (janela deslizante de 60s) responde 429 com
+    Retry-After, como o provedor real. ``max_simultaneas`` registra o pico de
+    requisições em andamento, para conferir o limite de concorrência do cliente.
+    """
+
+    def __init__(
+        self,
+        responder: Callable[[list[dict]], str] = responder_classificacao,
+        latencia: float = 0.0,
+        requisicoes_por_minuto: int = 0,
+        host: str = "127.0.0.1",
+        porta: int = 0,
+    ) -> None:
+        self.responder = responder
+        self.latencia = latencia
+        self.requisicoes_por_minuto = requisicoes_por_minuto
+        self.requisicoes = 0
+        self.rejeitadas = 0
+        self.tokens = 0
+        self.max_simultaneas = 0
+        self._em_andamento = 0
+        self._janela = deque()
+        self._lock = threading.Lock()
+        self._http = ThreadingHTTPServer((host, porta), _TratadorOpenAI)
+        self._http.daemon_threads = True
+        self._http.servidor_falso = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._http.server_address[:2]
+        return f"http://{host}:{porta}/v1"
+
+    def iniciar(self) -> "ServidorOpenAIFalso":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._http.serve_forever, name="openai-falso", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self) -> None:
+        if self._thread is not None:
+            self._http.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._http.server_close()
+
+    def __enter__(self) -> "ServidorOpenAIFalso":
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.parar()
+
+    def resumo(self) -> str:
+        return (
+            f"openai falso: {self.requisicoes} requisicoes, {self.rejeitadas} rejeitadas (429), "
+            f"{self.tokens} tokens, pico de {self.max_simultaneas} simultaneas"
+        )
+
+    def _admitir(self) -> float | None:
+        # Devolve None se a requisição entra, ou os segundos até abrir vaga na janela.
+        with self._lock:
+            agora = time.monotonic()
+            while self._janela and agora - self._janela[0] >= 60:
+                self._janela.popleft()
+
+            if self.requisicoes_por_minuto and len(self._janela) >= self.requisicoes_por_minuto:
+                self.rejeitadas += 1
+                return 60 - (agora - self._janela[0])
+
+            self._janela.append(agora)
+            self.requisicoes += 1
+            self._em_andamento += 1
+            self.max_simultaneas = max(self.max_simultaneas, self._em_andamento)
+            return None
+
+    def _liberar(self, tokens: int) -> None:
+        with self._lock:
+            self._em_andamento -= 1
+            self.tokens += tokens
+
+
+class _TratadorOpenAI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        servidor = self.server.servidor_falso
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._responder(404, {"error": {"message": f"Rota desconhecida: {self.path}", "type": "invalid_request_error"}})
+            return
+
+        espera = servidor._admitir()
+        if espera is not None:
+            self._responder(
+                429,
+                {"error": {"message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"Retry-After": str(max(1, round(espera)))},
+            )
+            return
+
+        tokens = 0
+        try:
+            if servidor.latencia:
+                time.sleep(servidor.latencia)
+
+            mensagens = corpo.get("messages", [])
+            conteudo = servidor.responder(mensagens)
+            prompt_tokens = sum(len(m.get("content") or "") for m in mensagens) // CARACTERES_POR_TOKEN + 1
+            completion_tokens = len(conteudo) // CARACTERES_POR_TOKEN + 1
+            tokens = prompt_tokens + completion_tokens
+
+            self._responder(200, {
+                "id": f"chatcmpl-falso-{servidor.requisicoes}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": corpo.get("model", "falso"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": conteudo},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": tokens,
+                },
+            })
+        finally:
+            servidor._liberar(tokens)
+
+    def _responder(self, status: int, payload: dict, cabecalhos: dict | None = None) -> None:
+        dados = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--porta", type=int, default=8001)
+    parser.add_argument("--latencia-ms", type=float, default=300.0)
+    parser.add_argument("--rpm", type=int, default=0, help="limite de requisicoes por minuto; 0 = sem limite")
+    args = parser.parse_args()
+
+    servidor = ServidorOpenAIFalso(latencia=args.latencia_ms / 1000, requisicoes_por_minuto=args.rpm, porta=args.porta)
+    print(f"Servidor OpenAI falso em {servidor.url} (Ctrl+C para encerrar)")
+    with servidor:
+        try:
+            while True:
+                time.sleep(60)
+                print(servidor.resumo())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark do parser de datas: loop sequencial original x parser por valores unicos.
+Execução: python benchmarks/bench_datas.py [--linhas 1000000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "dags"))
+from datas import TIMEZONE_PADRAO, converter_datas, converter_datas_sequencial  # noqa: E402
+
+
+def gerar_datas(linhas: int, dias_distintos: int = 1500, semente: int = 42) -> pd.Series:
+    rng = random.Random(semente)
+    base = pd.Timestamp("2021-01-01")
+    formatos = [
+        lambda d: d.strftime("%Y-%m-%dT%H:%M:%S.000-03:00"),
+        lambda d: d.strftime("%Y-%m-%dT%H:%M:%S-03:00"),
+        lambda d: d.strftime("%Y-%m-%d %H:%M:%S-03:00"),
+        lambda d: d.strftime("%Y-%m-%d"),
+        lambda d: d.strftime("%d/%m/%Y"),
+    ]
+    pesos = [60, 15, 10, 10, 5]
+
+    valores = []
+    for _ in range(dias_distintos):
+        dia = base + pd.Timedelta(days=rng.randrange(5 * 365))
+        formato = rng.choices(formatos, weights=pesos)[0]
+        valores.append(formato(dia))
+    valores.extend(["", "None", "data invalida"])
+
+    return pd.Series(rng.choices(valores, k=linhas))
+
+
+def converter_legado(datas: pd.Series) -> pd.Series:
+    return converter_datas_sequencial(datas.astype(str).str.strip()).dt.tz_convert(TIMEZONE_PADRAO)
+
+
+def cronometrar(funcao, datas: pd.Series) -> tuple[pd.Series, float]:
+    inicio = time.perf_counter()
+    resultado = funcao(datas)
+    return resultado, time.perf_counter() - inicio
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    datas = gerar_datas(args.linhas)
+    print(f"{len(datas)} linhas | {datas.nunique()} valores distintos")
+
+    legado, tempo_legado = cronometrar(converter_legado, datas)
+    novo, tempo_novo = cronometrar(converter_datas, datas)
+
+    pd.testing.assert_series_equal(legado, novo)
+    print(f"Loop sequencial original: {tempo_legado:.2f}s")
+    print(f"Parser por valores unicos: {tempo_novo:.2f}s")
+    print(f"Speedup: {tempo_legado / tempo_novo:.1f}x (resultados identicos)")
+
+
+if __name__ == "__main__":
+    main()
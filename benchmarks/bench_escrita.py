@@ -0,0 +1,87 @@
+"""
+Benchmark do caminho de escrita (salvar_particoes) contra o WebHDFS falso em processo.
+Execução: python benchmarks/bench_escrita.py [--linhas 200000] [--meses 12] [--latencia-ms 20] [--mbps 50]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "dags"))
+from armazenamento import ArmazenamentoLocal, ServidorWebHDFSFalso, criar_cliente_hdfs  # noqa: E402
+from escrita_particoes import caminho_particao, desserializar_particao, salvar_particoes  # noqa: E402
+
+
+def gerar_contratos(linhas: int, meses: int, semente: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(semente)
+    inicio = pd.Timestamp("2024-01-01", tz="America/Fortaleza")
+    datas = inicio + pd.to_timedelta(rng.integers(0, meses * 30, linhas), unit="D")
+
+    return pd.DataFrame({
+        "id": np.arange(linhas),
+        "isn_sic": rng.integers(1, 10_000, linhas),
+        "descricao_objeto": [f"Aquisicao de material {i % 997}" for i in range(linhas)],
+        "valor_contrato": rng.uniform(1_000, 1_000_000, linhas).round(2),
+        "data_assinatura": datas.strftime("%Y-%m-%dT%H:%M:%S.000-03:00"),
+        "ano": datas.year,
+        "mes": datas.strftime("%m"),
+    })
+
+
+def medir(client, df: pd.DataFrame, workers: int) -> float:
+    inicio = time.perf_counter()
+    salvar_particoes(client, df, "/contratos", "contratos", max_workers=workers)
+    return time.perf_counter() - inicio
+
+
+def contar_gravados(client, df: pd.DataFrame) -> int:
+    total = 0
+
+    for ano, mes in df.groupby(["ano", "mes"]).groups:
+        with client.read(caminho_particao("/contratos", "contratos", str(ano), str(mes))) as reader:
+            total += len(desserializar_particao(reader.read()))
+
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--mbps", type=float, default=50.0, help="banda do servidor falso; 0 = sem limite")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    df = gerar_contratos(args.linhas, args.meses)
+    tempos = {}
+
+    for workers in args.workers:
+        # Diretorio e servidor novos a cada rodada: no mesmo destino o hash do manifesto
+        # reconheceria as particoes ja gravadas e a escrita seria pulada.
+        with tempfile.TemporaryDirectory() as diretorio:
+            armazenamento = ArmazenamentoLocal(diretorio)
+            servidor = ServidorWebHDFSFalso(armazenamento, args.latencia_ms / 1000, args.mbps * 1024 * 1024)
+
+            with servidor:
+                client = criar_cliente_hdfs(servidor.url, "root", max_workers=workers)
+                tempos[workers] = medir(client, df, workers)
+                gravados = contar_gravados(client, df)
+                print(f"{workers} threads | {servidor.resumo()}")
+
+        assert servidor.bytes_recebidos > 0, f"{workers} threads: nenhum byte escrito"
+        assert gravados == len(df), f"{workers} threads: {gravados} registros lidos de volta, esperado {len(df)}"
+
+    print(f"{len(df)} linhas em {df.groupby(['ano', 'mes']).ngroups} particoes | "
+          f"latencia {args.latencia_ms:.0f} ms | banda {args.mbps or 'ilimitada'} MB/s")
+    for workers, tempo in tempos.items():
+        print(f"{workers} threads: {tempo:.2f}s (speedup {tempos[args.workers[0]] / tempo:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Benchmark das transformacoes das DAGs com registros sinteticos da API do Ceara Transparente.
+Mede tempo e pico de memoria de cada funcao e compara com a baseline salva em JSON.
+Execução: python benchmarks/bench_transformacoes.py [--linhas 10000 100000 1000000] [--salvar-baseline]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import gc
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "dags"))
+from armazenamento import ArmazenamentoLocal  # noqa: E402
+from bench_datas import gerar_datas  # noqa: E402
+from datas import converter_data_assinatura  # noqa: E402
+from escrita_particoes import salvar_grupo_no_hdfs  # noqa: E402
+from esquemas import COLUNAS_CONVENIOS, ESQUEMA_CONVENIOS, tipo_por_nome  # noqa: E402
+from preparo import preparar_contratos, preparar_registros  # noqa: E402
+
+BASELINE_PADRAO = Path(__file__).resolve().parent / "baseline_transformacoes.json"
+FRACAO_NULOS = 0.1
+# Campo que a API passou a mandar e que nao esta no esquema de convenios.
+CAMPO_NAO_DECLARADO = "metadados_integracao"
+
+
+def gerar_registros(linhas: int, semente: int = 42) -> list[dict]:
+    """Registros no formato da API de convenios: 59 campos do esquema mais um campo novo (60 no total).
+
+    Datas em varios formatos (com vazios e invalidos), ``FRACAO_NULOS`` de nulos por
+    campo, codigos e status com poucos valores distintos, valores ora numero ora texto.
+    """
+    rng = np.random.default_rng(semente)
+    textos = [f"Convenio de cooperacao tecnica numero {i} para apoio a municipios" for i in range(5000)]
+    colunas = {}
+
+    for posicao, coluna in enumerate(COLUNAS_CONVENIOS):
+        tipo = tipo_por_nome(coluna)
+        if coluna == "id":
+            colunas[coluna] = list(range(1, linhas + 1))
+            continue
+        if tipo == "int":
+            valores = rng.integers(1, 100_000, linhas).tolist()
+        elif tipo == "float":
+            numeros = rng.uniform(1_000, 5_000_000, linhas).round(2)
+            valores = [f"{valor:.2f}" if i % 3 == 0 else float(valor) for i, valor in enumerate(numeros)]
+        elif tipo == "data":
+            valores = gerar_datas(linhas, semente=semente + posicao).tolist()
+        elif tipo == "categoria" and coluna.startswith("cod_"):
+            valores = [f"{codigo:06d}" for codigo in rng.integers(0, 200, linhas)]
+        elif tipo == "categoria":
+            valores = [f"{coluna.upper()} {codigo}" for codigo in rng.integers(0, 6, linhas)]
+        else:
+            valores = [textos[indice] for indice in rng.integers(0, len(textos), linhas)]
+
+        for indice in np.flatnonzero(rng.random(linhas) < FRACAO_NULOS):
+            valores[indice] = None
+        colunas[coluna] = valores
+
+    colunas[CAMPO_NAO_DECLARADO] = [{"origem": "api", "versao": i % 3} for i in range(linhas)]
+
+    nomes = list(colunas)
+    return [dict(zip(nomes, linha)) for linha in zip(*colunas.values())]
+
+
+def montar_casos(registros: list[dict], diretorio: str) -> dict:
+    """Cada caso e (argumentos ja prontos, funcao medida); o preparo dos argumentos fica fora da medicao."""
+    datas = pd.Series([registro["data_assinatura"] for registro in registros])
+    df_convenios = preparar_registros(ESQUEMA_CONVENIOS.dataframe(registros)).drop(columns=["ano", "mes"])
+    client = ArmazenamentoLocal(diretorio)
+    schema = ESQUEMA_CONVENIOS.schema_arrow()
+    execucoes = iter(range(1_000_000))
+
+    def salvar(formato: str):
+        # Caminho novo a cada chamada: com o mesmo caminho o hash do manifesto pularia a escrita.
+        return lambda df: salvar_grupo_no_hdfs(
+            client, df, f"/bench/{next(execucoes)}", "convenios", "2024", "01", formato, schema, "overwrite"
+        )
+
+    return {
+        "converter_data_assinatura": (datas, converter_data_assinatura),
+        "preparar_convenios": (registros, lambda lote: preparar_registros(ESQUEMA_CONVENIOS.dataframe(lote))),
+        "preparar_contratos": (registros, preparar_contratos),
+        "salvar_grupo_no_hdfs_csv": (df_convenios, salvar("csv")),
+        "salvar_grupo_no_hdfs_parquet": (df_convenios, salvar("parquet")),
+    }
+
+
+def medir(funcao, argumento, repeticoes: int) -> dict:
+    # Tempo e memoria em execucoes separadas: o tracemalloc deixa as alocacoes mais lentas.
+    tempos = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeticoes):
+            gc.collect()
+            inicio = time.perf_counter()
+            funcao(argumento)
+            tempos.append(time.perf_counter() - inicio)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            funcao(argumento)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {"segundos": round(min(tempos), 4), "pico_mb": round(pico / 1024 / 1024, 2)}
+
+
+def comparar(atual: dict, referencia: dict | None, tolerancia: float) -> tuple[str, bool]:
+    # Caso sem referencia tambem falha: medir sem comparar nao pega regressao nenhuma.
+    if referencia is None:
+        return "sem baseline <- SEM REFERENCIA", True
+
+    razao_tempo = atual["segundos"] / referencia["segundos"] if referencia["segundos"] else 1.0
+    razao_memoria = atual["pico_mb"] / referencia["pico_mb"] if referencia["pico_mb"] else 1.0
+    regressao = razao_tempo > tolerancia or razao_memoria > tolerancia
+    return f"tempo {razao_tempo:.2f}x | memoria {razao_memoria:.2f}x{' <- REGRESSAO' if regressao else ''}", regressao
+
+
+def carregar_baseline(caminho: Path) -> dict:
+    if not caminho.exists():
+        return {}
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        return json.load(arquivo).get("resultados", {})
+
+
+def salvar_baseline(caminho: Path, resultados: dict) -> None:
+    # Tamanhos nao executados agora mantem os valores anteriores.
+    combinados = {**carregar_baseline(caminho), **resultados}
+    conteudo = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "maquina": platform.machine(),
+        "resultados": combinados,
+    }
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(conteudo, arquivo, ensure_ascii=False, indent=2)
+        arquivo.write("\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=3, help="o tempo registrado e o menor entre as repeticoes")
+    parser.add_argument("--funcoes", nargs="+", help="mede so estas funcoes (padrao: todas)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PADRAO)
+    parser.add_argument("--salvar-baseline", action="store_true", help="grava os resultados como nova baseline")
+    parser.add_argument("--tolerancia", type=float, default=1.2, help="razao acima da qual o resultado e regressao")
+    args = parser.parse_args()
+
+    baseline = carregar_baseline(args.baseline)
+    if not baseline and not args.salvar_baseline:
+        print(f"Baseline {args.baseline} nao encontrada; gere com --salvar-baseline.", file=sys.stderr)
+        sys.exit(2)
+    resultados = {}
+    houve_regressao = False
+
+    for linhas in args.linhas:
+        inicio = time.perf_counter()
+        registros = gerar_registros(linhas)
+        print(f"\n{linhas} registros x {len(registros[0])} campos gerados em {time.perf_counter() - inicio:.1f}s")
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            with redirect_stdout(io.StringIO()):
+                casos = montar_casos(registros, diretorio)
+
+            resultados[str(linhas)] = {}
+            for nome, (argumento, funcao) in casos.items():
+                if args.funcoes and nome not in args.funcoes:
+                    continue
+
+                atual = medir(funcao, argumento, args.repeticoes)
+                resultados[str(linhas)][nome] = atual
+                comparacao, regressao = comparar(atual, baseline.get(str(linhas), {}).get(nome), args.tolerancia)
+                houve_regressao |= regressao
+                print(f"  {nome:<30} {atual['segundos']:>8.3f}s {atual['pico_mb']:>9.1f} MB  ({comparacao})")
+
+        del registros, casos
+        gc.collect()
+
+    if args.salvar_baseline:
+        salvar_baseline(args.baseline, resultados)
+        print(f"\nBaseline gravada em {args.baseline}")
+    elif houve_regressao:
+        print(f"\nRegressao acima de {args.tolerancia:.2f}x (ou caso sem referencia) em relacao a {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Iterator, Protocol
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import requests
+from hdfs import HdfsError, InsecureClient
+from requests.adapters import HTTPAdapter
+
+ARMAZENAMENTO_BACKEND = os.getenv("ARMAZENAMENTO_BACKEND", "hdfs")
+HDFS_URL = os.getenv("HDFS_URL", "http://host.docker.internal:9870")
+HDFS_USER = os.getenv("HDFS_USER", "root")
+ARMAZENAMENTO_DIR_LOCAL = os.getenv("ARMAZENAMENTO_DIR_LOCAL", "/tmp/armazenamento_local")
+WEBHDFS_FALSO_LATENCIA_MS = float(os.getenv("WEBHDFS_FALSO_LATENCIA_MS", "0"))
+WEBHDFS_FALSO_MBPS = float(os.getenv("WEBHDFS_FALSO_MBPS", "0"))
+
+BACKENDS_SUPORTADOS = ("hdfs", "local", "webhdfs_falso")
+TAMANHO_BLOCO_TRANSFERENCIA = 64 * 1024
+
+
+class Armazenamento(Protocol):
+    """Subconjunto da API do ``hdfs.Client`` usado pelas DAGs e pela carga historica."""
+
+    def status(self, hdfs_path: str, strict: bool = True) -> dict | None: ...
+
+    def list(self, hdfs_path: str, status: bool = False) -> list: ...
+
+    def read(self, hdfs_path: str, encoding: str | None = None): ...
+
+    def write(self, hdfs_path: str, data=None, overwrite: bool = False, encoding: str | None = None) -> None: ...
+
+    def delete(self, hdfs_path: str, recursive: bool = False) -> bool: ...
+
+    def makedirs(self, hdfs_path: str) -> None: ...
+
+    def rename(self, hdfs_src_path: str, hdfs_dst_path: str) -> None: ...
+
+
+class ArmazenamentoLocal:
+    """Backend em disco com a mesma interface do ``InsecureClient``.
+
+    Caminhos absolutos do HDFS (``/contratos/2024/01/...``) ficam abaixo de ``raiz``.
+    A escrita vai para um arquivo temporario renomeado no final, entao um leitor
+    nunca ve um arquivo pela metade, como no HDFS.
+    """
+
+    def __init__(self, raiz: str) -> None:
+        self.raiz = os.path.abspath(raiz)
+        os.makedirs(self.raiz, exist_ok=True)
+
+    def caminho_local(self, hdfs_path: str) -> str:
+        relativo = os.path.normpath("/" + hdfs_path.lstrip("/")).lstrip("/")
+        return os.path.join(self.raiz, relativo)
+
+    def status(self, hdfs_path: str, strict: bool = True) -> dict | None:
+        caminho = self.caminho_local(hdfs_path)
+
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            if strict:
+                raise HdfsError(f"File does not exist: {hdfs_path}", exception="FileNotFoundException")
+            return None
+
+        return {
+            "pathSuffix": "",
+            "type": "DIRECTORY" if os.path.isdir(caminho) else "FILE",
+            "length": 0 if os.path.isdir(caminho) else info.st_size,
+            "modificationTime": int(info.st_mtime * 1000),
+        }
+
+    def list(self, hdfs_path: str, status: bool = False) -> list:
+        caminho = self.caminho_local(hdfs_path)
+        if not os.path.isdir(caminho):
+            raise HdfsError(f"{hdfs_path!r} is not a directory.")
+
+        nomes = sorted(nome for nome in os.listdir(caminho) if not nome.endswith(".tmp"))
+        if not status:
+            return nomes
+        return [(nome, {**self.status(f"{hdfs_path}/{nome}"), "pathSuffix": nome}) for nome in nomes]
+
+    @contextmanager
+    def read(self, hdfs_path: str, encoding: str | None = None):
+        caminho = self.caminho_local(hdfs_path)
+        if not os.path.isfile(caminho):
+            raise HdfsError(f"File does not exist: {hdfs_path}", exception="FileNotFoundException")
+
+        with open(caminho, "r" if encoding else "rb", encoding=encoding) as reader:
+            yield reader
+
+    def write(self, hdfs_path: str, data=None, overwrite: bool = False, encoding: str | None = None) -> None:
+        if data is None:
+            raise ValueError("ArmazenamentoLocal.write exige o parametro data.")
+
+        caminho = self.caminho_local(hdfs_path)
+        if os.path.exists(caminho) and not overwrite:
+            raise HdfsError(f"{hdfs_path} already exists", exception="FileAlreadyExistsException")
+
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        caminho_tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(caminho_tmp, "wb") as writer:
+                for bloco in _blocos(data):
+                    writer.write(bloco.encode(encoding or "utf-8") if isinstance(bloco, str) else bloco)
+            os.replace(caminho_tmp, caminho)
+        finally:
+            if os.path.exists(caminho_tmp):
+                os.remove(caminho_tmp)
+
+    def delete(self, hdfs_path: str, recursive: bool = False) -> bool:
+        caminho = self.caminho_local(hdfs_path)
+
+        if os.path.isdir(caminho):
+            if os.listdir(caminho) and not recursive:
+                raise HdfsError(f"{hdfs_path} is non empty", exception="PathIsNotEmptyDirectoryException")
+            shutil.rmtree(caminho)
+            return True
+        if os.path.exists(caminho):
+            os.remove(caminho)
+            return True
+        return False
+
+    def makedirs(self, hdfs_path: str) -> None:
+        os.makedirs(self.caminho_local(hdfs_path), exist_ok=True)
+
+    def rename(self, hdfs_src_path: str, hdfs_dst_path: str) -> None:
+        origem = self.caminho_local(hdfs_src_path)
+        destino = self.caminho_local(hdfs_dst_path)
+
+        if os.path.isdir(destino):
+            destino = os.path.join(destino, os.path.basename(origem))
+        if not os.path.exists(origem) or os.path.exists(destino) or not os.path.isdir(os.path.dirname(destino)):
+            raise HdfsError(f"Unable to rename {hdfs_src_path!r} to {hdfs_dst_path!r}.")
+        os.rename(origem, destino)
+
+
+class ServidorWebHDFSFalso:
+    """NameNode + DataNode WebHDFS em processo, gravando num ``ArmazenamentoLocal``.
+
+    Fala o protocolo que o ``InsecureClient`` usa, inclusive o redirect 307 do CREATE
+    para o DataNode e o upload em chunked encoding, entao o caminho de escrita real
+    (sessao, pool de conexoes, upload em blocos) roda sem cluster. ``latencia`` e
+    somada a cada requisicao; ``bytes_por_segundo`` limita a banda, compartilhada
+    por todas as conexoes como a placa de rede de um DataNode.
+    """
+
+    def __init__(
+        self,
+        armazenamento: ArmazenamentoLocal,
+        latencia: float = 0.0,
+        bytes_por_segundo: float = 0.0,
+        host: str = "127.0.0.1",
+        porta: int = 0,
+    ) -> None:
+        self.armazenamento = armazenamento
+        self.latencia = latencia
+        self.bytes_por_segundo = bytes_por_segundo
+        self.requisicoes = 0
+        self.bytes_recebidos = 0
+        self.bytes_enviados = 0
+        self._lock = threading.Lock()
+        self._banda_livre_em = 0.0
+        self._http = ThreadingHTTPServer((host, porta), _TratadorWebHDFS)
+        self._http.daemon_threads = True
+        self._http.servidor_falso = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._http.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self) -> "ServidorWebHDFSFalso":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._http.serve_forever, name="webhdfs-falso", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self) -> None:
+        if self._thread is not None:
+            self._http.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._http.server_close()
+
+    def __enter__(self) -> "ServidorWebHDFSFalso":
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.parar()
+
+    def resumo(self) -> str:
+        return (
+            f"webhdfs falso: {self.requisicoes} requisicoes, {self.bytes_recebidos} bytes recebidos, "
+            f"{self.bytes_enviados} bytes enviados"
+        )
+
+    def _consumir_banda(self, tamanho: int, recebido: bool) -> None:
+        with self._lock:
+            if recebido:
+                self.bytes_recebidos += tamanho
+            else:
+                self.bytes_enviados += tamanho
+            if self.bytes_por_segundo <= 0:
+                return
+            # Cada bloco reserva a sua janela no link; transferencias simultaneas
+            # entram na fila e dividem a banda.
+            agora = time.monotonic()
+            self._banda_livre_em = max(agora, self._banda_livre_em) + tamanho / self.bytes_por_segundo
+            espera = self._banda_livre_em - agora
+        time.sleep(espera)
+
+
+class _TratadorWebHDFS(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    prefixo = "/webhdfs/v1"
+
+    def do_GET(self) -> None:
+        self._despachar({"GETFILESTATUS": self._getfilestatus, "LISTSTATUS": self._liststatus, "OPEN": self._open})
+
+    def do_PUT(self) -> None:
+        self._despachar({"CREATE": self._create, "MKDIRS": self._mkdirs, "RENAME": self._rename})
+
+    def do_DELETE(self) -> None:
+        self._despachar({"DELETE": self._delete})
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    @property
+    def servidor(self) -> ServidorWebHDFSFalso:
+        return self.server.servidor_falso
+
+    def _despachar(self, operacoes: dict) -> None:
+        servidor = self.servidor
+        with servidor._lock:
+            servidor.requisicoes += 1
+        if servidor.latencia > 0:
+            time.sleep(servidor.latencia)
+
+        url = urlsplit(self.path)
+        self.params = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+        self.hdfs_path = unquote(url.path[len(self.prefixo):]) or "/"
+        operacao = operacoes.get(self.params.get("op", "").upper())
+
+        if not url.path.startswith(self.prefixo) or operacao is None:
+            self._descartar_corpo()
+            self._erro(400, "IllegalArgumentException", f"Operacao nao suportada: {self.command} {self.path}")
+            return
+
+        try:
+            operacao()
+        except HdfsError as erro:
+            codigo = 404 if erro.exception == "FileNotFoundException" else 403
+            self._erro(codigo, erro.exception or "IOException", str(erro))
+
+    def _getfilestatus(self) -> None:
+        self._json({"FileStatus": self.servidor.armazenamento.status(self.hdfs_path)})
+
+    def _liststatus(self) -> None:
+        armazenamento = self.servidor.armazenamento
+        status = armazenamento.status(self.hdfs_path)
+        if status["type"] == "FILE":
+            self._json({"FileStatuses": {"FileStatus": [status]}})
+            return
+        itens = [status_item for _, status_item in armazenamento.list(self.hdfs_path, status=True)]
+        self._json({"FileStatuses": {"FileStatus": itens}})
+
+    def _open(self) -> None:
+        servidor = self.servidor
+        with servidor.armazenamento.read(self.hdfs_path) as reader:
+            conteudo = reader.read()
+
+        inicio = int(self.params.get("offset", 0))
+        fim = inicio + int(self.params["length"]) if "length" in self.params else len(conteudo)
+        conteudo = conteudo[inicio:fim]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        for posicao in range(0, len(conteudo), TAMANHO_BLOCO_TRANSFERENCIA):
+            bloco = conteudo[posicao:posicao + TAMANHO_BLOCO_TRANSFERENCIA]
+            servidor._consumir_banda(len(bloco), recebido=False)
+            self.wfile.write(bloco)
+
+    def _create(self) -> None:
+        armazenamento = self.servidor.armazenamento
+        overwrite = self.params.get("overwrite", "false").lower() == "true"
+        if not overwrite and armazenamento.status(self.hdfs_path, strict=False) is not None:
+            self._descartar_corpo()
+            raise HdfsError(f"{self.hdfs_path} already exists", exception="FileAlreadyExistsException")
+
+        if "datanode" not in self.params:
+            # Passo 1 no NameNode: devolve o endereco do "DataNode" (este mesmo servidor).
+            self._descartar_corpo()
+            destino = f"{self.servidor.url}{self.prefixo}{quote(self.hdfs_path)}?op=CREATE&datanode=true"
+            self.send_response(307)
+            self.send_header("Location", f"{destino}&overwrite={str(overwrite).lower()}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        armazenamento.write(self.hdfs_path, data=self._ler_corpo(), overwrite=overwrite)
+        self.send_response(201)
+        self.send_header("Location", f"hdfs://{self.hdfs_path}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _mkdirs(self) -> None:
+        self.servidor.armazenamento.makedirs(self.hdfs_path)
+        self._json({"boolean": True})
+
+    def _rename(self) -> None:
+        try:
+            self.servidor.armazenamento.rename(self.hdfs_path, self.params["destination"])
+        except HdfsError:
+            self._json({"boolean": False})
+            return
+        self._json({"boolean": True})
+
+    def _delete(self) -> None:
+        recursivo = self.params.get("recursive", "false").lower() == "true"
+        self._json({"boolean": self.servidor.armazenamento.delete(self.hdfs_path, recursive=recursivo)})
+
+    def _ler_corpo(self) -> Iterator[bytes]:
+        servidor = self.servidor
+
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                tamanho = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if tamanho == 0:
+                    # Trailers opcionais terminam numa linha vazia.
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                bloco = self.rfile.read(tamanho)
+                self.rfile.readline()
+                servidor._consumir_banda(len(bloco), recebido=True)
+                yield bloco
+        else:
+            restante = int(self.headers.get("Content-Length", 0))
+            while restante > 0:
+                bloco = self.rfile.read(min(restante, TAMANHO_BLOCO_TRANSFERENCIA))
+                if not bloco:
+                    return
+                restante -= len(bloco)
+                servidor._consumir_banda(len(bloco), recebido=True)
+                yield bloco
+
+    def _descartar_corpo(self) -> None:
+        for _ in self._ler_corpo():
+            pass
+
+    def _json(self, corpo: dict, codigo: int = 200) -> None:
+        conteudo = json.dumps(corpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def _erro(self, codigo: int, excecao: str, mensagem: str) -> None:
+        self._json({"RemoteException": {"exception": excecao, "javaClassName": "", "message": mensagem}}, codigo)
+
+
+def criar_cliente_hdfs(url: str, user: str, max_workers: int = 4) -> InsecureClient:
+    # Um unico cliente (e pool HTTP) atende todas as threads de escrita; o pool
+    # precisa comportar uma conexao por thread para o NameNode e os DataNodes.
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(max_workers, 1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return InsecureClient(url, user=user, session=session)
+
+
+_servidor_falso: ServidorWebHDFSFalso | None = None
+_lock_servidor = threading.Lock()
+
+
+def servidor_falso_padrao() -> ServidorWebHDFSFalso:
+    global _servidor_falso
+
+    with _lock_servidor:
+        if _servidor_falso is None:
+            _servidor_falso = ServidorWebHDFSFalso(
+                ArmazenamentoLocal(ARMAZENAMENTO_DIR_LOCAL),
+                latencia=WEBHDFS_FALSO_LATENCIA_MS / 1000,
+                bytes_por_segundo=WEBHDFS_FALSO_MBPS * 1024 * 1024,
+            ).iniciar()
+        return _servidor_falso
+
+
+def criar_armazenamento(max_workers: int = 4, backend: str = ARMAZENAMENTO_BACKEND) -> Armazenamento:
+    """Devolve o backend configurado em ``ARMAZENAMENTO_BACKEND``.
+
+    ``hdfs`` e o cluster real; ``local`` grava direto em ``ARMAZENAMENTO_DIR_LOCAL``;
+    ``webhdfs_falso`` sobe o servidor em processo sobre esse mesmo diretorio e
+    devolve um ``InsecureClient`` apontado para ele.
+    """
+    if backend == "hdfs":
+        return criar_cliente_hdfs(HDFS_URL, HDFS_USER, max_workers)
+    if backend == "local":
+        return ArmazenamentoLocal(ARMAZENAMENTO_DIR_LOCAL)
+    if backend == "webhdfs_falso":
+        return criar_cliente_hdfs(servidor_falso_padrao().url, HDFS_USER, max_workers)
+    raise ValueError(f"Backend de armazenamento nao suportado: {backend} (use um de {BACKENDS_SUPORTADOS})")
+
+
+def _blocos(data) -> Iterator[bytes | str]:
+    if isinstance(data, (bytes, bytearray, str)):
+        yield data
+    elif hasattr(data, "read"):
+        while bloco := data.read(TAMANHO_BLOCO_TRANSFERENCIA):
+            yield bloco
+    else:
+        yield from data
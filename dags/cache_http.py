@@ -0,0 +1,164 @@
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "")
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", "3600"))
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "512"))
+
+CABECALHOS_GUARDADOS = ("Content-Type", "ETag", "Last-Modified")
+# O despejo desce ate esta fracao de max_bytes, para nao varrer o diretorio a cada escrita com o cache cheio.
+FRACAO_APOS_DESPEJO = 0.9
+
+
+@dataclass
+class EntradaCache:
+    url: str
+    corpo: bytes
+    cabecalhos: dict
+    guardado_em: float
+
+    def fresca(self, ttl: int) -> bool:
+        return time.time() - self.guardado_em < ttl
+
+    def cabecalhos_revalidacao(self) -> dict:
+        headers = {}
+        if self.cabecalhos.get("ETag"):
+            headers["If-None-Match"] = self.cabecalhos["ETag"]
+        if self.cabecalhos.get("Last-Modified"):
+            headers["If-Modified-Since"] = self.cabecalhos["Last-Modified"]
+        return headers
+
+    def resposta(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.corpo
+        response.headers = CaseInsensitiveDict(self.cabecalhos)
+        response.url = self.url
+        response.encoding = "utf-8"
+        return response
+
+
+class CacheHTTP:
+    """Cache em disco de respostas GET, com TTL, revalidacao condicional e despejo LRU por tamanho.
+
+    Cada entrada ocupa dois arquivos (``<chave>.body`` e ``<chave>.json``); o mtime do
+    corpo marca o ultimo acesso e e usado para despejar as entradas menos recentes
+    quando o diretorio passa de ``max_bytes``. O tamanho total e mantido em memoria
+    (uma varredura na criacao); o diretorio so e percorrido de novo para despejar.
+    """
+
+    def __init__(self, diretorio: str, ttl: int = HTTP_CACHE_TTL, max_bytes: int = HTTP_CACHE_MAX_MB * 1024 * 1024) -> None:
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        self._total_bytes = sum(tamanho for _, tamanho, _ in self._listar_corpos())
+
+    @staticmethod
+    def chave(url: str, params: dict | None = None) -> str:
+        params_ordenados = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        texto = json.dumps([url, params_ordenados], ensure_ascii=False)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def obter(self, chave: str) -> EntradaCache | None:
+        caminho_corpo, caminho_meta = self._caminhos(chave)
+
+        try:
+            with open(caminho_meta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(caminho_corpo, "rb") as f:
+                corpo = f.read()
+            os.utime(caminho_corpo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        return EntradaCache(meta["url"], corpo, meta["cabecalhos"], meta["guardado_em"])
+
+    def guardar(self, chave: str, response: requests.Response) -> None:
+        caminho_corpo, caminho_meta = self._caminhos(chave)
+        meta = {
+            "url": response.url,
+            "cabecalhos": {k: response.headers[k] for k in CABECALHOS_GUARDADOS if k in response.headers},
+            "guardado_em": time.time(),
+        }
+
+        try:
+            tamanho_anterior = os.stat(caminho_corpo).st_size
+        except FileNotFoundError:
+            tamanho_anterior = 0
+
+        self._escrever_atomico(caminho_corpo, response.content)
+        self._escrever_atomico(caminho_meta, json.dumps(meta).encode("utf-8"))
+
+        with self._lock:
+            self._total_bytes += len(response.content) - tamanho_anterior
+            excedeu = self._total_bytes > self.max_bytes
+        if excedeu:
+            self._despejar()
+
+    def renovar(self, chave: str) -> None:
+        _, caminho_meta = self._caminhos(chave)
+
+        try:
+            with open(caminho_meta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        meta["guardado_em"] = time.time()
+        self._escrever_atomico(caminho_meta, json.dumps(meta).encode("utf-8"))
+
+    def _caminhos(self, chave: str) -> tuple[str, str]:
+        base = os.path.join(self.diretorio, chave)
+        return f"{base}.body", f"{base}.json"
+
+    def _escrever_atomico(self, caminho: str, conteudo: bytes) -> None:
+        caminho_tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(caminho_tmp, "wb") as f:
+            f.write(conteudo)
+        os.replace(caminho_tmp, caminho)
+
+    def _listar_corpos(self) -> list[tuple[float, int, str]]:
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".body"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.diretorio, nome))
+            except FileNotFoundError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, nome[: -len(".body")]))
+        return entradas
+
+    def _despejar(self) -> None:
+        with self._lock:
+            # A varredura tambem corrige o total, caso outro processo use o mesmo diretorio.
+            entradas = self._listar_corpos()
+            total = sum(tamanho for _, tamanho, _ in entradas)
+
+            alvo = self.max_bytes * FRACAO_APOS_DESPEJO if total > self.max_bytes else self.max_bytes
+            for _, tamanho, chave in sorted(entradas):
+                if total <= alvo:
+                    break
+                for caminho in self._caminhos(chave):
+                    try:
+                        os.remove(caminho)
+                    except FileNotFoundError:
+                        pass
+                total -= tamanho
+
+            self._total_bytes = total
+
+
+def cache_padrao() -> CacheHTTP | None:
+    if not HTTP_CACHE_DIR:
+        return None
+    return CacheHTTP(HTTP_CACHE_DIR)
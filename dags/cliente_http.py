@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache_http import CacheHTTP, cache_padrao
+
+HTTP_MAX_TENTATIVAS = int(os.getenv("HTTP_MAX_TENTATIVAS", "5"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1.0"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "60"))
+HTTP_TAXA_POR_HOST = float(os.getenv("HTTP_TAXA_POR_HOST", "5"))
+HTTP_RAJADA_POR_HOST = int(os.getenv("HTTP_RAJADA_POR_HOST", "5"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "60"))
+
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+class LimitadorTaxa:
+    """Token bucket: libera ``taxa`` requisicoes por segundo com rajadas de ate ``capacidade``."""
+
+    def __init__(self, taxa: float, capacidade: int) -> None:
+        self.taxa = taxa
+        self.capacidade = max(capacidade, 1)
+        self._tokens = float(self.capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self) -> float:
+        if self.taxa <= 0:
+            return 0.0
+
+        espera_total = 0.0
+
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return espera_total
+
+                espera = (1 - self._tokens) / self.taxa
+
+            time.sleep(espera)
+            espera_total += espera
+
+
+@dataclass
+class EstatisticasHTTP:
+    requisicoes: int = 0
+    retries: int = 0
+    tempo_backoff: float = 0.0
+    tempo_limitador: float = 0.0
+    cache_hits: int = 0
+    revalidacoes: int = 0
+
+    def resumo(self) -> str:
+        return (
+            f"HTTP: {self.requisicoes} requisicoes | {self.retries} retries | "
+            f"espera por backoff={self.tempo_backoff:.1f}s | espera no limitador={self.tempo_limitador:.1f}s | "
+            f"cache: {self.cache_hits} hits, {self.revalidacoes} revalidacoes (304)"
+        )
+
+
+class ClienteHTTP:
+    """Sessao HTTP compartilhada com pool keep-alive, retry com backoff e limite de taxa por host."""
+
+    def __init__(
+        self,
+        max_tentativas: int = HTTP_MAX_TENTATIVAS,
+        backoff_base: float = HTTP_BACKOFF_BASE,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        taxa_por_host: float = HTTP_TAXA_POR_HOST,
+        rajada_por_host: int = HTTP_RAJADA_POR_HOST,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        timeout: int = HTTP_TIMEOUT,
+        cache: CacheHTTP | None = None,
+    ) -> None:
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.taxa_por_host = taxa_por_host
+        self.rajada_por_host = rajada_por_host
+        self.timeout = timeout
+        self.cache = cache
+        self.estatisticas = EstatisticasHTTP()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._limitadores: dict[str, LimitadorTaxa] = {}
+        self._lock = threading.Lock()
+
+    def configurar_host(self, host: str, taxa: float, rajada: int | None = None) -> None:
+        with self._lock:
+            self._limitadores[host] = LimitadorTaxa(taxa, rajada or self.rajada_por_host)
+
+    def get(
+        self,
+        url: str,
+        params: dict | None = None,
+        headers: dict | None = None,
+        timeout: int | None = None,
+        max_tentativas: int | None = None,
+        usar_cache: bool = True,
+    ) -> requests.Response:
+        if self.cache is None or not usar_cache:
+            return self._get_com_retry(url, params, headers, timeout, max_tentativas)
+
+        chave = CacheHTTP.chave(url, params)
+        entrada = self.cache.obter(chave)
+
+        if entrada is not None and entrada.fresca(self.cache.ttl):
+            self._somar(cache_hits=1)
+            return entrada.resposta()
+
+        headers_condicionais = {**(headers or {}), **(entrada.cabecalhos_revalidacao() if entrada else {})}
+        response = self._get_com_retry(url, params, headers_condicionais, timeout, max_tentativas)
+
+        if response.status_code == 304 and entrada is not None:
+            self.cache.renovar(chave)
+            self._somar(revalidacoes=1)
+            return entrada.resposta()
+
+        if response.status_code == 200:
+            self.cache.guardar(chave, response)
+
+        return response
+
+    def _get_com_retry(
+        self,
+        url: str,
+        params: dict | None,
+        headers: dict | None,
+        timeout: int | None,
+        max_tentativas: int | None,
+    ) -> requests.Response:
+        # Devolve a resposta final (inclusive 4xx/5xx) para o chamador decidir com
+        # raise_for_status; so excecoes de rede esgotadas sao propagadas.
+        limitador = self._limitador(urlparse(url).netloc)
+        tentativas = max_tentativas or self.max_tentativas
+
+        for tentativa in range(1, tentativas + 1):
+            self._somar(tempo_limitador=limitador.aguardar(), requisicoes=1)
+
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as erro:
+                if tentativa == tentativas:
+                    raise
+                self._aguardar_backoff(tentativa, tentativas, None, f"{type(erro).__name__} em {url}")
+                continue
+
+            if response.status_code in STATUS_RETENTAVEIS and tentativa < tentativas:
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+                self._aguardar_backoff(tentativa, tentativas, retry_after, f"status {response.status_code} em {url}")
+                continue
+
+            return response
+
+        raise RuntimeError("Numero de tentativas deve ser maior que zero.")
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _limitador(self, host: str) -> LimitadorTaxa:
+        with self._lock:
+            if host not in self._limitadores:
+                self._limitadores[host] = LimitadorTaxa(self.taxa_por_host, self.rajada_por_host)
+            return self._limitadores[host]
+
+    def _aguardar_backoff(self, tentativa: int, tentativas: int, retry_after: str | None, motivo: str) -> None:
+        # Backoff exponencial com "full jitter"; Retry-After do servidor e respeitado como piso.
+        espera = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (tentativa - 1)))
+        if retry_after and retry_after.strip().isdigit():
+            espera = max(espera, min(float(retry_after), self.backoff_max))
+
+        print(f"Tentativa {tentativa}/{tentativas} falhou ({motivo}); aguardando {espera:.1f}s")
+        self._somar(retries=1, tempo_backoff=espera)
+        time.sleep(espera)
+
+    def _somar(
+        self,
+        requisicoes: int = 0,
+        retries: int = 0,
+        tempo_backoff: float = 0.0,
+        tempo_limitador: float = 0.0,
+        cache_hits: int = 0,
+        revalidacoes: int = 0,
+    ) -> None:
+        with self._lock:
+            self.estatisticas.cache_hits += cache_hits
+            self.estatisticas.revalidacoes += revalidacoes
+            self.estatisticas.requisicoes += requisicoes
+            self.estatisticas.retries += retries
+            self.estatisticas.tempo_backoff += tempo_backoff
+            self.estatisticas.tempo_limitador += tempo_limitador
+
+
+_cliente_compartilhado: ClienteHTTP | None = None
+_lock_cliente = threading.Lock()
+
+
+def obter_cliente() -> ClienteHTTP:
+    global _cliente_compartilhado
+
+    with _lock_cliente:
+        if _cliente_compartilhado is None:
+            _cliente_compartilhado = ClienteHTTP(cache=cache_padrao())
+        return _cliente_compartilhado
@@ -0,0 +1,141 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import statistics
+import time
+from typing import Iterator
+
+from cliente_http import ClienteHTTP, obter_cliente
+
+
+@dataclass
+class EstatisticasColeta:
+    total_pages: int = 0
+    total_records: int = 0
+    latencias: dict[int, float] = field(default_factory=dict)
+    tempo_total: float = 0.0
+
+    def resumo(self) -> str:
+        if not self.latencias:
+            return "Nenhuma pagina coletada."
+
+        valores = sorted(self.latencias.values())
+        p95 = valores[min(len(valores) - 1, int(round(0.95 * (len(valores) - 1))))]
+        paginas_por_segundo = len(valores) / self.tempo_total if self.tempo_total else 0.0
+        return (
+            f"Latencia por pagina (s): media={statistics.mean(valores):.3f} "
+            f"p50={statistics.median(valores):.3f} p95={p95:.3f} max={valores[-1]:.3f} | "
+            f"{len(valores)} paginas em {self.tempo_total:.1f}s ({paginas_por_segundo:.2f} paginas/s)"
+        )
+
+
+def buscar_pagina(cliente: ClienteHTTP, url: str, params: dict, page: int) -> tuple[dict, float]:
+    inicio = time.perf_counter()
+    response = cliente.get(url, params={**params, "page": page})
+    response.raise_for_status()
+    payload = response.json()
+    return payload, time.perf_counter() - inicio
+
+
+def iterar_paginas(
+    cliente: ClienteHTTP,
+    url: str,
+    params: dict,
+    max_workers: int = 1,
+    estatisticas: EstatisticasColeta | None = None,
+    pagina_inicio: int = 1,
+    pagina_fim: int | None = None,
+) -> Iterator[tuple[int, list[dict]]]:
+    """Percorre as paginas ``pagina_inicio..pagina_fim`` da API e devolve (pagina, registros) em ordem.
+
+    Sem ``pagina_fim``, a primeira pagina do intervalo e buscada sozinha para
+    descobrir ``sumary.total_pages`` e a coleta vai ate a ultima pagina. As demais
+    sao distribuidas em ate ``max_workers`` threads, com no maximo
+    ``2 * max_workers`` paginas em andamento para limitar a memoria retida.
+    """
+    estatisticas = estatisticas if estatisticas is not None else EstatisticasColeta()
+    inicio_coleta = time.perf_counter()
+
+    if pagina_fim is None:
+        payload, latencia = buscar_pagina(cliente, url, params, pagina_inicio)
+        summary = payload.get("sumary", {})
+        estatisticas.total_pages = int(summary.get("total_pages", 1))
+        estatisticas.total_records = int(summary.get("total_records", 0))
+        estatisticas.latencias[pagina_inicio] = latencia
+
+        print(f"Total de paginas: {estatisticas.total_pages}")
+        print(f"Total de registros: {estatisticas.total_records}")
+
+        yield pagina_inicio, _registros_da_pagina(pagina_inicio, payload, latencia)
+        pagina_inicio, pagina_fim = pagina_inicio + 1, estatisticas.total_pages
+
+    paginas_restantes = iter(range(pagina_inicio, pagina_fim + 1))
+    janela = max(max_workers, 1) * 2
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        pendentes = deque()
+
+        for page in paginas_restantes:
+            pendentes.append((page, executor.submit(buscar_pagina, cliente, url, params, page)))
+            if len(pendentes) >= janela:
+                break
+
+        while pendentes:
+            page, future = pendentes.popleft()
+            payload, latencia = future.result()
+            estatisticas.latencias[page] = latencia
+
+            proxima = next(paginas_restantes, None)
+            if proxima is not None:
+                pendentes.append((proxima, executor.submit(buscar_pagina, cliente, url, params, proxima)))
+
+            yield page, _registros_da_pagina(page, payload, latencia)
+
+    estatisticas.tempo_total = time.perf_counter() - inicio_coleta
+    print(estatisticas.resumo())
+
+
+def contar_paginas(url: str, params: dict) -> tuple[int, int]:
+    """Devolve ``(total_pages, total_records)`` da consulta, lendo so a primeira pagina."""
+    payload, _ = buscar_pagina(obter_cliente(), url, params, 1)
+    summary = payload.get("sumary", {})
+    return int(summary.get("total_pages", 1)), int(summary.get("total_records", 0))
+
+
+def iterar_registros(
+    url: str,
+    params: dict,
+    max_workers: int = 1,
+    estatisticas: EstatisticasColeta | None = None,
+    pagina_inicio: int = 1,
+    pagina_fim: int | None = None,
+) -> Iterator[list[dict]]:
+    cliente = obter_cliente()
+
+    for _, page_data in iterar_paginas(cliente, url, params, max_workers, estatisticas, pagina_inicio, pagina_fim):
+        if page_data:
+            yield page_data
+
+    print(cliente.estatisticas.resumo())
+
+
+def coletar_paginas(
+    url: str, params: dict, max_workers: int = 1, estatisticas: EstatisticasColeta | None = None
+) -> list[dict]:
+    registros = []
+
+    for page_data in iterar_registros(url, params, max_workers, estatisticas):
+        registros.extend(page_data)
+
+    return registros
+
+
+def _registros_da_pagina(page: int, payload: dict, latencia: float) -> list[dict]:
+    page_data = payload.get("data", [])
+
+    if page_data:
+        print(f"Pagina {page}: {len(page_data)} registros coletados ({latencia:.2f}s)")
+    else:
+        print(f"Pagina {page}: sem registros ({latencia:.2f}s)")
+
+    return page_data
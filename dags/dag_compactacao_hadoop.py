@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+import json
+import math
+import os
+import re
+
+import pandas as pd
+import pendulum
+from airflow.providers.standard.operators.python import PythonOperator
+from airflow.sdk import DAG
+
+from armazenamento import Armazenamento, criar_armazenamento
+
+# ----------------- CONFIGURAÇÕES -----------------
+DIRETORIO_ORIGEM = "/data"
+DIRETORIO_COMPACTADO = "/data/compactado"
+TAMANHO_ALVO_MB = int(os.getenv("COMPACTACAO_TAMANHO_ALVO_MB", "128"))
+TIMEZONE = "America/Fortaleza"
+# -------------------------------------------------
+
+# Arquivos gerados pela DAG exemplo_hadoop: /data/dados_YYYY-mm-dd-HH-MM-SS.csv
+PADRAO_ORIGEM = re.compile(r"^dados_(\d{4}-\d{2}-\d{2})-\d{2}-\d{2}-\d{2}\.csv$")
+PADRAO_MANIFESTO = re.compile(r"^_manifesto_v(\d{4})\.json$")
+
+
+def listar_origens_por_dia(client: Armazenamento) -> dict[str, list[str]]:
+    origens = {}
+
+    for nome in sorted(client.list(DIRETORIO_ORIGEM)):
+        match = PADRAO_ORIGEM.match(nome)
+        if match:
+            origens.setdefault(match.group(1), []).append(nome)
+
+    return origens
+
+
+def ler_csv(client: Armazenamento, caminho: str) -> pd.DataFrame:
+    with client.read(caminho) as reader:
+        return pd.read_csv(BytesIO(reader.read()), dtype=str, keep_default_na=False)
+
+
+def carregar_versao_confirmada(client: Armazenamento, diretorio_dia: str) -> dict | None:
+    """Devolve o manifesto da versao compactada mais recente cujas partes existem e batem em linhas.
+
+    O manifesto so e gravado depois que todas as partes foram escritas e conferidas,
+    entao ele funciona como o commit da versao; partes sem manifesto sao lixo de uma
+    execucao interrompida.
+    """
+    if client.status(diretorio_dia, strict=False) is None:
+        return None
+
+    nomes = client.list(diretorio_dia)
+    versoes = sorted((int(m.group(1)), nome) for nome in nomes if (m := PADRAO_MANIFESTO.match(nome)))
+
+    for _, nome_manifesto in reversed(versoes):
+        with client.read(f"{diretorio_dia}/{nome_manifesto}", encoding="utf-8") as reader:
+            manifesto = json.load(reader)
+
+        if all(
+            parte in nomes and len(ler_csv(client, f"{diretorio_dia}/{parte}")) == linhas
+            for parte, linhas in manifesto["partes"].items()
+        ):
+            return manifesto
+
+        print(f"Manifesto {nome_manifesto} nao confere com as partes; ignorando esta versao.")
+
+    return None
+
+
+def remover_versoes_antigas(client: Armazenamento, diretorio_dia: str, manifesto: dict) -> None:
+    manter = set(manifesto["partes"]) | {f"_manifesto_v{manifesto['versao']:04d}.json"}
+
+    for nome in client.list(diretorio_dia):
+        if nome not in manter:
+            client.delete(f"{diretorio_dia}/{nome}")
+            print(f"Removido arquivo de versao antiga/incompleta: {diretorio_dia}/{nome}")
+
+
+def remover_origens(client: Armazenamento, nomes: list[str]) -> None:
+    for nome in nomes:
+        if client.delete(f"{DIRETORIO_ORIGEM}/{nome}"):
+            print(f"Origem removida: {DIRETORIO_ORIGEM}/{nome}")
+
+
+def compactar_dia(client: Armazenamento, dia: str, origens: list[str]) -> None:
+    diretorio_dia = f"{DIRETORIO_COMPACTADO}/{dia}"
+    confirmado = carregar_versao_confirmada(client, diretorio_dia)
+    origens_confirmadas = set(confirmado["arquivos_origem"]) if confirmado else set()
+
+    if confirmado:
+        # Retomada: uma execucao anterior confirmou a versao mas pode ter caido
+        # antes de apagar as origens ou as versoes antigas.
+        remover_versoes_antigas(client, diretorio_dia, confirmado)
+        remover_origens(client, [nome for nome in origens if nome in origens_confirmadas])
+
+    novas = [nome for nome in origens if nome not in origens_confirmadas]
+    if not novas:
+        print(f"{dia}: nada novo para compactar.")
+        return
+
+    quadros = []
+    arquivos_origem = dict(confirmado["arquivos_origem"]) if confirmado else {}
+    tamanho_total = 0
+
+    for parte in (confirmado["partes"] if confirmado else {}):
+        quadros.append(ler_csv(client, f"{diretorio_dia}/{parte}"))
+        tamanho_total += client.status(f"{diretorio_dia}/{parte}")["length"]
+    for nome in novas:
+        df_origem = ler_csv(client, f"{DIRETORIO_ORIGEM}/{nome}")
+        quadros.append(df_origem)
+        arquivos_origem[nome] = len(df_origem)
+        tamanho_total += client.status(f"{DIRETORIO_ORIGEM}/{nome}")["length"]
+
+    df_dia = pd.concat(quadros, ignore_index=True)
+    linhas_esperadas = sum(arquivos_origem.values())
+    if len(df_dia) != linhas_esperadas:
+        raise ValueError(f"{dia}: {len(df_dia)} linhas lidas, mas as origens somam {linhas_esperadas}.")
+
+    versao = confirmado["versao"] + 1 if confirmado else 1
+    num_partes = max(1, math.ceil(tamanho_total / (TAMANHO_ALVO_MB * 1024 * 1024)))
+    tamanho_parte = math.ceil(len(df_dia) / num_partes)
+    partes = {}
+
+    for numero in range(num_partes):
+        df_parte = df_dia.iloc[numero * tamanho_parte:(numero + 1) * tamanho_parte]
+        nome_parte = f"dados_{dia}_v{versao:04d}_parte{numero:03d}.csv"
+        client.write(f"{diretorio_dia}/{nome_parte}", data=df_parte.to_csv(index=False), encoding="utf-8", overwrite=True)
+
+        linhas_gravadas = len(ler_csv(client, f"{diretorio_dia}/{nome_parte}"))
+        if linhas_gravadas != len(df_parte):
+            raise ValueError(f"{nome_parte}: {linhas_gravadas} linhas gravadas, esperado {len(df_parte)}.")
+        partes[nome_parte] = linhas_gravadas
+
+    manifesto = {
+        "versao": versao,
+        "dia": dia,
+        "linhas": linhas_esperadas,
+        "partes": partes,
+        "arquivos_origem": arquivos_origem,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+    }
+    client.write(
+        f"{diretorio_dia}/_manifesto_v{versao:04d}.json",
+        data=json.dumps(manifesto, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+        overwrite=True,
+    )
+    print(f"{dia}: versao {versao} confirmada com {linhas_esperadas} linhas em {len(partes)} parte(s).")
+
+    remover_versoes_antigas(client, diretorio_dia, manifesto)
+    remover_origens(client, novas)
+
+
+def compactar_arquivos_pequenos(**context) -> None:
+    client = criar_armazenamento()
+    # Os arquivos do dia corrente ainda estao sendo gerados a cada 5 minutos.
+    hoje = datetime.now().strftime("%Y-%m-%d")
+
+    for dia, origens in listar_origens_por_dia(client).items():
+        if dia >= hoje:
+            continue
+        print(f"{dia}: {len(origens)} arquivos de origem")
+        compactar_dia(client, dia, origens)
+
+
+default_args = {
+    "owner": "airflow",
+    "retries": 1,
+    "retry_delay": timedelta(minutes=5),
+}
+
+
+with DAG(
+    dag_id="compactacao_hadoop",
+    default_args=default_args,
+    description="Compacta os CSVs pequenos de /data em arquivos diarios verificados",
+    schedule="30 1 * * *",
+    start_date=pendulum.datetime(2025, 1, 31, tz=TIMEZONE),
+    catchup=False,
+    max_active_runs=1,
+    tags=["hdfs", "manutencao"],
+) as dag:
+    tarefa_compactar = PythonOperator(
+        task_id="compactar_arquivos_pequenos",
+        python_callable=compactar_arquivos_pequenos,
+    )
+
+    tarefa_compactar
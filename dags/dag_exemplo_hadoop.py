@@ -4,12 +4,11 @@ from io import BytesIO
 import pandas as pd
 from airflow import DAG
 from airflow.operators.python import PythonOperator
-from hdfs import InsecureClient
+
+from armazenamento import criar_armazenamento
 
 
 def enviar_dados_para_hdfs() -> None:
-    hdfs_url = "http://host.docker.internal:9870"
-    hdfs_user = "root"
     timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
     hdfs_path = f"/data/dados_{timestamp}.csv"
 
@@ -21,7 +20,7 @@ def enviar_dados_para_hdfs() -> None:
     df = pd.DataFrame(data)
 
     csv_bytes = df.to_csv(index=False).encode("utf-8")
-    client = InsecureClient(hdfs_url, user=hdfs_user)
+    client = criar_armazenamento()
 
     with BytesIO(csv_bytes) as reader:
         client.write(hdfs_path, reader, overwrite=True)
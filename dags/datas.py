@@ -0,0 +1,84 @@
+import pandas as pd
+
+TIMEZONE_PADRAO = "America/Fortaleza"
+
+FORMATOS_DATA = [
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+]
+
+_OFFSET = r"(?:Z|[+-]\d{2}(?::?\d{2})?)"
+_PADROES_DATA = [
+    rf"\d{{4}}-\d{{2}}-\d{{2}}T\d{{2}}:\d{{2}}:\d{{2}}\.\d{{1,9}}{_OFFSET}",
+    rf"\d{{4}}-\d{{2}}-\d{{2}}T\d{{2}}:\d{{2}}:\d{{2}}{_OFFSET}",
+    rf"\d{{4}}-\d{{2}}-\d{{2}} \d{{2}}:\d{{2}}:\d{{2}}{_OFFSET}",
+    r"\d{4}-\d{2}-\d{2}",
+    r"\d{2}/\d{2}/\d{4}",
+]
+# Uma unica regex com um grupo nomeado por formato: um str.extract classifica
+# todos os valores de uma vez.
+_REGEX_FORMATOS = "^(?:" + "|".join(f"(?P<f{i}>{padrao})" for i, padrao in enumerate(_PADROES_DATA)) + ")$"
+
+
+def converter_datas(datas: pd.Series, timezone: str = TIMEZONE_PADRAO) -> pd.Series:
+    """Converte textos de data em datetime com timezone, parseando cada valor distinto uma unica vez.
+
+    Datas se repetem muito (varios contratos assinados no mesmo dia), entao os
+    valores sao fatorados, o formato de cada valor unico e detectado por regex e
+    o resultado e espalhado de volta pelos codigos. O resultado e identico ao da
+    tentativa sequencial de ``FORMATOS_DATA`` linha a linha.
+    """
+    if isinstance(datas.dtype, pd.DatetimeTZDtype):
+        return datas.dt.tz_convert(timezone)
+
+    # Nulos viram codigo -1 no factorize; o loop original os via como o texto
+    # "None"/"nan", que nunca converte, entao o resultado (NaT) e o mesmo.
+    codigos, unicos = pd.factorize(datas)
+    unicos_texto = pd.Series(unicos, dtype="object").astype(str).str.strip()
+    convertidos = _converter_unicos(unicos_texto)
+
+    resultado = pd.Series(convertidos.array.take(codigos, allow_fill=True), index=datas.index)
+    return resultado.dt.tz_convert(timezone)
+
+
+def converter_data_assinatura(datas: pd.Series, timezone: str = TIMEZONE_PADRAO) -> pd.Series:
+    return converter_datas(datas, timezone)
+
+
+def converter_datas_sequencial(datas_texto: pd.Series) -> pd.Series:
+    data_convertida = pd.Series(pd.NaT, index=datas_texto.index, dtype="datetime64[ns, UTC]")
+
+    for formato in FORMATOS_DATA:
+        mascara_pendente = data_convertida.isna()
+        if not mascara_pendente.any():
+            break
+
+        data_convertida.loc[mascara_pendente] = pd.to_datetime(
+            datas_texto.loc[mascara_pendente],
+            format=formato,
+            errors="coerce",
+            utc=True,
+        )
+
+    return data_convertida
+
+
+def _converter_unicos(unicos: pd.Series) -> pd.Series:
+    convertidos = pd.Series(pd.NaT, index=unicos.index, dtype="datetime64[ns, UTC]")
+    grupos = unicos.str.extract(_REGEX_FORMATOS).notna()
+
+    for i, formato in enumerate(FORMATOS_DATA):
+        mascara = grupos[f"f{i}"]
+        if mascara.any():
+            convertidos.loc[mascara] = pd.to_datetime(unicos.loc[mascara], format=formato, errors="coerce", utc=True)
+
+    # O que a regex nao reconheceu (ex.: dia com um digito, que o strptime aceita)
+    # passa pela tentativa sequencial original, garantindo o mesmo resultado.
+    pendentes = convertidos.isna()
+    if pendentes.any():
+        convertidos.loc[pendentes] = converter_datas_sequencial(unicos.loc[pendentes])
+
+    return convertidos
@@ -0,0 +1,325 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+import hashlib
+import json
+import os
+import time
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from armazenamento import Armazenamento
+from esquemas import TIPOS_ARROW, para_texto, tipo_por_nome
+from manifestos import COLUNA_DATA_MANIFESTO, gravar_manifesto, ler_manifesto, montar_manifesto
+
+FORMATO_SAIDA = os.getenv("FORMATO_SAIDA", "csv")
+COMPRESSAO_PARQUET = os.getenv("COMPRESSAO_PARQUET", "zstd")
+MODO_ESCRITA = os.getenv("MODO_ESCRITA", "overwrite")
+MAX_WORKERS_ESCRITA = int(os.getenv("MAX_WORKERS_ESCRITA", "4"))
+LINHAS_POR_BLOCO_CSV = int(os.getenv("LINHAS_POR_BLOCO_CSV", "20000"))
+
+FORMATOS_SUPORTADOS = ("csv", "parquet")
+MODOS_SUPORTADOS = ("overwrite", "merge")
+
+
+@dataclass
+class ResultadoEscrita:
+    caminho: str
+    registros: int
+    bytes_escritos: int
+
+
+def tipo_coluna(nome: str) -> pa.DataType:
+    return TIPOS_ARROW[tipo_por_nome(nome)]
+
+
+def schema_arrow(colunas: Iterable[str]) -> pa.Schema:
+    return pa.schema([(coluna, tipo_coluna(coluna)) for coluna in colunas])
+
+
+def caminho_particao(base_path: str, prefixo: str, ano: str, mes: str, formato: str = FORMATO_SAIDA) -> str:
+    if formato not in FORMATOS_SUPORTADOS:
+        raise ValueError(f"Formato de saida nao suportado: {formato}")
+    return f"{base_path}/{ano}/{mes}/{prefixo}_{ano}_{mes}.{formato}"
+
+
+def tabela_arrow(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    colunas = {}
+
+    for campo in schema:
+        serie = df[campo.name] if campo.name in df.columns else pd.Series(None, index=df.index, dtype="object")
+        colunas[campo.name] = _converter_serie(serie, campo.type)
+
+    return pa.Table.from_pandas(pd.DataFrame(colunas, index=df.index), schema=schema, preserve_index=False)
+
+
+def serializar_parquet(df: pd.DataFrame, schema: pa.Schema | None = None, compressao: str = COMPRESSAO_PARQUET) -> bytes:
+    tabela = tabela_arrow(df, schema if schema is not None else schema_arrow(df.columns))
+
+    with BytesIO() as buffer:
+        pq.write_table(tabela, buffer, compression=compressao)
+        return buffer.getvalue()
+
+
+def iterar_csv(df: pd.DataFrame, linhas_por_bloco: int = LINHAS_POR_BLOCO_CSV) -> Iterator[bytes]:
+    # Cada bloco e codificado e entregue sozinho: no upload so um bloco fica em memoria.
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+
+    for inicio in range(0, len(df), linhas_por_bloco):
+        yield df.iloc[inicio:inicio + linhas_por_bloco].to_csv(index=False, header=False).encode("utf-8")
+
+
+def iterar_particao(df: pd.DataFrame, formato: str = FORMATO_SAIDA, schema: pa.Schema | None = None) -> Iterator[bytes]:
+    if formato == "parquet":
+        # O Parquet precisa do rodape com os metadados no fim; o arquivo comprimido
+        # inteiro e montado em memoria e enviado como um unico bloco.
+        yield serializar_parquet(df, schema)
+    else:
+        yield from iterar_csv(df)
+
+
+def serializar_particao(df: pd.DataFrame, formato: str = FORMATO_SAIDA, schema: pa.Schema | None = None) -> bytes:
+    return b"".join(iterar_particao(df, formato, schema))
+
+
+def desserializar_particao(conteudo: bytes, formato: str = FORMATO_SAIDA) -> pd.DataFrame:
+    if formato == "parquet":
+        return pq.read_table(BytesIO(conteudo)).to_pandas()
+    return pd.read_csv(BytesIO(conteudo), dtype=str, keep_default_na=False, na_values=[""])
+
+
+def ler_bytes_particao(client: Armazenamento, hdfs_path: str) -> bytes | None:
+    if client.status(hdfs_path, strict=False) is None:
+        return None
+
+    with client.read(hdfs_path) as reader:
+        return reader.read()
+
+
+def mesclar_registros(df_atual: pd.DataFrame, df_novo: pd.DataFrame) -> pd.DataFrame:
+    """Une a particao existente com os registros novos, um registro por ``id``.
+
+    Para cada ``id`` fica a versao com o ``updated_at`` mais recente (empate favorece
+    o registro novo). A ordem de primeira aparicao e preservada, entao reescrever o
+    mesmo conjunto gera exatamente o mesmo arquivo.
+    """
+    combinado = pd.concat([df_atual, df_novo], ignore_index=True, sort=False)
+
+    if "id" not in combinado.columns:
+        return combinado
+
+    chave = combinado["id"].map(para_texto)
+    sem_id = chave.isna()
+    chave.loc[sem_id] = [f"__sem_id_{i}" for i in combinado.index[sem_id]]
+
+    ordem = pd.DataFrame({"chave": chave, "indice": range(len(combinado))}, index=combinado.index)
+    ordem["posicao"] = ordem.groupby("chave")["indice"].transform("min")
+
+    if "updated_at" in combinado.columns:
+        ordem["updated_at"] = _converter_datas(combinado["updated_at"])
+        ordem = ordem.sort_values(["updated_at", "indice"], na_position="first", kind="stable")
+    vencedores = ordem.drop_duplicates("chave", keep="last").sort_values("posicao", kind="stable")
+
+    return combinado.loc[vencedores.index].reset_index(drop=True)
+
+
+def hash_registros(df: pd.DataFrame, formato: str = FORMATO_SAIDA, schema: pa.Schema | None = None) -> str:
+    """Hash deterministico do conjunto de registros de uma particao, sem serializar o arquivo.
+
+    Cada linha vira um hash de 64 bits (vetorizado pelo pandas); os hashes sao
+    ordenados antes de combinar, entao a mesma coleta com as linhas em outra ordem
+    gera o mesmo valor. Antes do hash cada coluna e convertida para o tipo logico
+    do esquema, como na escrita: o mesmo dado com outro dtype (``string[pyarrow]``
+    ou ``object``, data com ou sem timezone) gera o mesmo hash. Colunas, formato e
+    schema entram no hash: mudar qualquer um deles forca uma nova escrita.
+    """
+    tipos = {campo.name: campo.type for campo in schema} if schema is not None else {}
+    normalizado = pd.DataFrame(
+        {coluna: _serie_para_hash(df[coluna], tipos.get(coluna) or tipo_coluna(coluna)) for coluna in df.columns},
+        index=df.index,
+    )
+    linhas = pd.util.hash_pandas_object(normalizado, index=False).to_numpy()
+
+    digest = hashlib.sha256()
+    cabecalho = [formato, [str(coluna) for coluna in df.columns], str(schema)]
+    digest.update(json.dumps(cabecalho).encode("utf-8"))
+    digest.update(np.sort(linhas).tobytes())
+    return digest.hexdigest()
+
+
+def salvar_grupo_no_hdfs(
+    client: Armazenamento,
+    df_mes: pd.DataFrame,
+    base_path: str,
+    prefixo: str,
+    ano: str,
+    mes: str,
+    formato: str = FORMATO_SAIDA,
+    schema: pa.Schema | None = None,
+    modo: str = MODO_ESCRITA,
+) -> ResultadoEscrita:
+    if modo not in MODOS_SUPORTADOS:
+        raise ValueError(f"Modo de escrita nao suportado: {modo}")
+
+    hdfs_path = caminho_particao(base_path, prefixo, ano, mes, formato)
+
+    # Mesmo conjunto de registros ja gravado: nada a enviar (nem a baixar, no merge,
+    # ja que mesclar uma particao com ela mesma nao muda nada).
+    hash_novo = hash_registros(df_mes, formato, schema)
+    if _particao_inalterada(client, hdfs_path, hash_novo):
+        print(f"Hash inalterado em {hdfs_path} ({len(df_mes)} registros); escrita ignorada.")
+        return ResultadoEscrita(hdfs_path, len(df_mes), 0)
+
+    conteudo_atual = ler_bytes_particao(client, hdfs_path) if modo == "merge" else None
+
+    if conteudo_atual is not None:
+        df_atual = desserializar_particao(conteudo_atual, formato)
+        df_mes = mesclar_registros(df_atual, df_mes)
+
+        if _mesmo_conteudo(iterar_particao(df_mes, formato, schema), conteudo_atual):
+            print(f"Sem alteracoes em {hdfs_path} ({len(df_mes)} registros); escrita ignorada.")
+            if ler_manifesto(client, hdfs_path) is None:
+                _gravar_manifesto(
+                    client, hdfs_path, formato, df_mes, schema, len(conteudo_atual), hashlib.sha256(conteudo_atual)
+                )
+            return ResultadoEscrita(hdfs_path, len(df_mes), 0)
+
+        print(f"Merge em {hdfs_path}: {len(df_atual)} registros existentes -> {len(df_mes)} apos merge")
+
+    bytes_escritos = [0]
+    digest = hashlib.sha256()
+    blocos = _contar_bytes(iterar_particao(df_mes, formato, schema), bytes_escritos, digest)
+    client.write(hdfs_path, data=blocos, overwrite=True)
+    _gravar_manifesto(
+        client, hdfs_path, formato, df_mes, schema, bytes_escritos[0], digest,
+        hash_novo if conteudo_atual is None else None,
+    )
+
+    print(f"Arquivo salvo: {hdfs_path} ({len(df_mes)} registros, {bytes_escritos[0]} bytes)")
+    return ResultadoEscrita(hdfs_path, len(df_mes), bytes_escritos[0])
+
+
+def salvar_particoes(
+    client: Armazenamento,
+    df: pd.DataFrame,
+    base_path: str,
+    prefixo: str,
+    schema: pa.Schema | None = None,
+    max_workers: int = MAX_WORKERS_ESCRITA,
+) -> list[ResultadoEscrita]:
+    """Separa ``df`` por ano/mes e envia as particoes em paralelo, todas pelo mesmo cliente."""
+    inicio = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        futures = [
+            executor.submit(
+                salvar_grupo_no_hdfs, client, df_mes.drop(columns=["ano", "mes"]), base_path, prefixo, str(ano), str(mes),
+                schema=schema,
+            )
+            for (ano, mes), df_mes in df.groupby(["ano", "mes"], dropna=False)
+        ]
+        resultados = [future.result() for future in futures]
+
+    duracao = time.perf_counter() - inicio
+    total_bytes = sum(resultado.bytes_escritos for resultado in resultados)
+    total_registros = sum(resultado.registros for resultado in resultados)
+    vazao = total_bytes / duracao / 1024 / 1024 if duracao else 0.0
+    print(
+        f"{len(resultados)} particoes, {total_registros} registros, {total_bytes} bytes escritos "
+        f"em {duracao:.2f}s ({vazao:.2f} MB/s, {max_workers} threads)"
+    )
+    return resultados
+
+
+def _contar_bytes(blocos: Iterable[bytes], contador: list[int], digest=None) -> Iterator[bytes]:
+    for bloco in blocos:
+        contador[0] += len(bloco)
+        if digest is not None:
+            digest.update(bloco)
+        yield bloco
+
+
+def _gravar_manifesto(
+    client: Armazenamento,
+    hdfs_path: str,
+    formato: str,
+    df: pd.DataFrame,
+    schema: pa.Schema | None,
+    tamanho: int,
+    digest,
+    hash_df: str | None = None,
+) -> None:
+    # Escrito depois do arquivo: um manifesto sempre descreve um arquivo completo.
+    colunas = schema.names if formato == "parquet" and schema is not None else list(df.columns)
+    datas = _converter_datas(df[COLUNA_DATA_MANIFESTO]) if COLUNA_DATA_MANIFESTO in df.columns else None
+    hash_df = hash_df or hash_registros(df, formato, schema)
+    manifesto = montar_manifesto(hdfs_path, formato, len(df), colunas, tamanho, digest.hexdigest(), datas, hash_df)
+    gravar_manifesto(client, manifesto)
+
+
+def _particao_inalterada(client: Armazenamento, hdfs_path: str, hash_novo: str) -> bool:
+    manifesto = ler_manifesto(client, hdfs_path)
+    if manifesto is None or manifesto.hash_registros != hash_novo:
+        return False
+
+    # Confere que o arquivo descrito pelo manifesto ainda e o que esta no HDFS.
+    status = client.status(hdfs_path, strict=False)
+    return status is not None and status["length"] == manifesto.bytes
+
+
+def _mesmo_conteudo(blocos: Iterable[bytes], conteudo: bytes) -> bool:
+    posicao = 0
+
+    for bloco in blocos:
+        if conteudo[posicao:posicao + len(bloco)] != bloco:
+            return False
+        posicao += len(bloco)
+
+    return posicao == len(conteudo)
+
+
+def _converter_serie(serie: pd.Series, tipo: pa.DataType) -> pd.Series:
+    if pa.types.is_int64(tipo):
+        return pd.to_numeric(serie, errors="coerce").astype("Int64")
+    if pa.types.is_float64(tipo):
+        return pd.to_numeric(serie, errors="coerce").astype("float64")
+    if pa.types.is_timestamp(tipo):
+        return _converter_datas(serie)
+    return serie.map(para_texto).astype("object")
+
+
+def _serie_para_hash(serie: pd.Series, tipo: pa.DataType) -> pd.Series:
+    # O hash do pandas ja e igual para texto em object, string e category, e para
+    # int64 e Int64: colunas ja tipadas so precisam de um cast barato. Object ou
+    # dtype que nao bate com o tipo logico passa pela conversao completa da escrita.
+    if pa.types.is_string(tipo) and (pd.api.types.is_string_dtype(serie.dtype) or isinstance(serie.dtype, pd.CategoricalDtype)):
+        return serie.map(para_texto) if serie.dtype == "object" else serie
+    if pa.types.is_int64(tipo) and pd.api.types.is_integer_dtype(serie.dtype):
+        return serie
+    if pa.types.is_float64(tipo) and pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+        # Float64 guarda o nulo como pd.NA, que tem outro hash que o NaN do float64.
+        return serie.astype("float64")
+    if pa.types.is_timestamp(tipo) and pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        return _converter_datas(serie)
+    return _converter_serie(serie, tipo)
+
+
+def _converter_datas(serie: pd.Series) -> pd.Series:
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        return serie.dt.tz_convert("UTC")
+    if pd.api.types.is_datetime64_dtype(serie.dtype):
+        # Datetime sem timezone e tratado como UTC, o mesmo que o texto sem offset.
+        return serie.dt.tz_localize("UTC")
+
+    texto = serie.map(para_texto)
+    convertida = pd.to_datetime(texto, errors="coerce", utc=True, format="ISO8601")
+    pendentes = convertida.isna() & texto.notna()
+
+    if pendentes.any():
+        convertida.loc[pendentes] = pd.to_datetime(texto.loc[pendentes], errors="coerce", utc=True, format="%d/%m/%Y")
+
+    return convertida
@@ -0,0 +1,140 @@
+from dataclasses import dataclass, field
+import json
+from typing import Iterable
+
+import pandas as pd
+import pyarrow as pa
+
+from datas import converter_datas
+
+# Tipos logicos do registro -> tipo no pandas (memoria) e no Arrow/Parquet (arquivo).
+TIPOS_PANDAS = {
+    "int": "Int64",
+    "float": "float64",
+    "data": "datetime64[ns, UTC]",
+    "categoria": "category",
+    # Texto em buffer Arrow: sem um objeto str do Python por celula.
+    "texto": "string[pyarrow]",
+}
+TIPOS_ARROW = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "data": pa.timestamp("us", tz="UTC"),
+    "categoria": pa.string(),
+    "texto": pa.string(),
+}
+COLUNAS_DATA_EXTRAS = ("created_at", "updated_at")
+
+# Campos de status/classificacao: poucos valores distintos repetidos em milhares de linhas.
+COLUNAS_CATEGORIA = (
+    "descricao_modalidade", "descricao_tipo", "flg_tipo", "tipo_objeto", "contract_type",
+    "infringement_status", "accountability_status", "descricao_situacao", "confidential",
+)
+
+
+def tipo_por_nome(coluna: str) -> str:
+    # O tipo sai so do nome da coluna, entao e o mesmo em todo lote e todo mes,
+    # independente de quais valores vieram (ou nao) da API.
+    if coluna == "id" or coluna.startswith("isn_"):
+        return "int"
+    if coluna.startswith("valor_") or coluna.startswith("calculated_valor_"):
+        return "float"
+    if coluna.startswith("data_") or coluna in COLUNAS_DATA_EXTRAS:
+        return "data"
+    if coluna.startswith("cod_") or coluna in COLUNAS_CATEGORIA:
+        return "categoria"
+    return "texto"
+
+
+@dataclass(frozen=True, eq=False)
+class Esquema:
+    """Tipos das colunas de um dataset, aplicados ao montar o DataFrame a partir dos registros da API.
+
+    Com ``somente_declaradas`` os campos fora de ``tipos`` sao descartados ja na
+    leitura; sem ele, campos novos sao mantidos com o tipo deduzido pelo nome.
+    """
+
+    nome: str
+    tipos: dict[str, str] = field(default_factory=dict)
+    somente_declaradas: bool = True
+
+    def tipo(self, coluna: str) -> str | None:
+        if coluna in self.tipos:
+            return self.tipos[coluna]
+        return None if self.somente_declaradas else tipo_por_nome(coluna)
+
+    def schema_arrow(self) -> pa.Schema:
+        return pa.schema([(coluna, TIPOS_ARROW[tipo]) for coluna, tipo in self.tipos.items()])
+
+    def dataframe(self, registros: list[dict]) -> pd.DataFrame:
+        """Monta o DataFrame coluna a coluna, ja com os tipos compactos.
+
+        Nenhuma matriz de objetos com todos os campos e criada: cada coluna mantida
+        e extraida dos dicts e convertida sozinha.
+        """
+        presentes = dict.fromkeys(chave for registro in registros for chave in registro)
+        if self.somente_declaradas:
+            colunas = [coluna for coluna in self.tipos if coluna in presentes]
+        else:
+            colunas = [*(coluna for coluna in self.tipos if coluna in presentes),
+                       *(coluna for coluna in presentes if coluna not in self.tipos)]
+
+        return pd.DataFrame(
+            {coluna: converter_coluna([registro.get(coluna) for registro in registros], self.tipo(coluna))
+             for coluna in colunas},
+            index=pd.RangeIndex(len(registros)),
+        )
+
+
+def converter_coluna(valores: Iterable, tipo: str) -> pd.Series:
+    serie = pd.Series(list(valores), dtype="object")
+
+    if tipo == "int":
+        numeros = pd.to_numeric(serie, errors="coerce")
+        return numeros.where(numeros == numeros.round()).astype(TIPOS_PANDAS["int"])
+    if tipo == "float":
+        return pd.to_numeric(serie, errors="coerce").astype(TIPOS_PANDAS["float"])
+    if tipo == "data":
+        return converter_datas(serie.map(para_texto), timezone="UTC")
+    if tipo == "categoria":
+        return serie.map(para_texto).astype(TIPOS_PANDAS["categoria"])
+    return serie.map(para_texto).astype(TIPOS_PANDAS["texto"])
+
+
+def para_texto(valor) -> str | None:
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return None
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    return str(valor)
+
+
+COLUNAS_CONVENIOS = (
+    "id", "cod_concedente", "cod_financiador", "cod_gestora", "cod_orgao",
+    "cod_secretaria", "descricao_modalidade", "descricao_objeto", "descricao_tipo",
+    "descricao_url", "data_assinatura", "data_processamento", "data_termino",
+    "flg_tipo", "isn_parte_destino", "isn_sic", "num_spu", "valor_contrato",
+    "isn_modalidade", "isn_entidade", "tipo_objeto", "num_spu_licitacao",
+    "descricao_justificativa", "valor_can_rstpg", "data_publicacao_portal",
+    "descricao_url_pltrb", "descricao_url_ddisp", "descricao_url_inexg",
+    "cod_plano_trabalho", "num_certidao", "descriaco_edital",
+    "cpf_cnpj_financiador", "num_contrato", "valor_original_concedente",
+    "valor_original_contrapartida", "valor_atualizado_concedente",
+    "valor_atualizado_contrapartida", "created_at", "updated_at",
+    "plain_num_contrato", "calculated_valor_aditivo", "calculated_valor_ajuste",
+    "calculated_valor_empenhado", "calculated_valor_pago", "contract_type",
+    "infringement_status", "cod_financiador_including_zeroes",
+    "accountability_status", "plain_cpf_cnpj_financiador", "descricao_situacao",
+    "data_publicacao_doe", "descricao_nome_credor", "isn_parte_origem",
+    "data_auditoria", "data_termino_original", "data_inicio", "data_rescisao",
+    "confidential", "gestor_contrato",
+)
+
+ESQUEMA_CONVENIOS = Esquema("convenios", {coluna: tipo_por_nome(coluna) for coluna in COLUNAS_CONVENIOS})
+
+# Contratos nao tem lista fixa de campos: todos sao mantidos, tipados pelo nome.
+ESQUEMA_CONTRATOS = Esquema("contratos", somente_declaradas=False)
+
+ESQUEMAS = {esquema.nome: esquema for esquema in (ESQUEMA_CONTRATOS, ESQUEMA_CONVENIOS)}
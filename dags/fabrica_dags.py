@@ -0,0 +1,222 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import partial
+import os
+
+import pendulum
+from airflow.providers.standard.operators.python import PythonOperator
+from airflow.sdk import DAG
+
+from armazenamento import criar_armazenamento
+from coleta_paginada import contar_paginas, iterar_registros
+from escrita_particoes import MAX_WORKERS_ESCRITA, salvar_particoes
+from esquemas import Esquema
+from intermediarios import (
+    caminho_intermediario,
+    diretorio_execucao,
+    gravar_arrow,
+    ler_arrow,
+    limpar_intermediarios,
+    unificar_tabelas,
+)
+from preparo import preparar_registros
+from spool_ndjson import gravar_ndjson, ler_ndjson_em_dataframes
+
+TIMEZONE = "America/Fortaleza"
+MAX_WORKERS_COLETA = int(os.getenv("MAX_WORKERS_COLETA", "4"))
+TAMANHO_LOTE_PREPARO = int(os.getenv("TAMANHO_LOTE_PREPARO", "5000"))
+PAGINAS_POR_FATIA = int(os.getenv("PAGINAS_POR_FATIA", "25"))
+MAX_FATIAS_SIMULTANEAS = int(os.getenv("MAX_FATIAS_SIMULTANEAS", "8"))
+
+PREFIXO_PREPARADO = "preparado_"
+
+default_args = {
+    "owner": "airflow",
+    "retries": 1,
+    "retry_delay": timedelta(minutes=5),
+}
+
+
+@dataclass(frozen=True)
+class ConfigEndpoint:
+    """Tudo o que diferencia uma DAG de extracao da API do Ceara Transparente de outra."""
+
+    nome: str
+    api_url: str
+    hdfs_base_path: str
+    schedule: str
+    start_date: pendulum.DateTime
+    esquema: Esquema
+    catchup: bool = False
+    meses_por_execucao: int = 1
+    paginas_por_fatia: int = PAGINAS_POR_FATIA
+
+    @property
+    def dag_id(self) -> str:
+        return f"api_{self.nome}_ceara_hdfs"
+
+    @property
+    def schema_parquet(self):
+        # Sem lista fechada de colunas, o schema sai das colunas de cada particao.
+        return self.esquema.schema_arrow() if self.esquema.somente_declaradas else None
+
+
+def definir_periodo_execucao(config: ConfigEndpoint, **context) -> dict:
+    logical_date = context["logical_date"].in_tz(TIMEZONE)
+    inicio = logical_date.start_of("month").subtract(months=config.meses_por_execucao - 1)
+    fim = logical_date.end_of("month")
+    periodo = {
+        "data_inicio": inicio.format("DD/MM/YYYY"),
+        "data_fim": fim.format("DD/MM/YYYY"),
+    }
+    print(f"Periodo definido: {periodo['data_inicio']} a {periodo['data_fim']}")
+    return periodo
+
+
+def planejar_fatias(config: ConfigEndpoint, **context) -> list[dict]:
+    """Quebra o periodo em fatias de (mes, faixa de paginas), uma tarefa mapeada por fatia.
+
+    A ultima faixa de cada mes fica aberta (``pagina_fim=None``) e vai ate o
+    ``total_pages`` que a API informar na hora da coleta, entao registros que
+    chegarem depois do planejamento nao ficam de fora.
+    """
+    periodo = context["ti"].xcom_pull(task_ids="definir_periodo_execucao")
+    inicio = pendulum.from_format(periodo["data_inicio"], "DD/MM/YYYY", tz=TIMEZONE)
+    fim = pendulum.from_format(periodo["data_fim"], "DD/MM/YYYY", tz=TIMEZONE)
+    fatias = []
+
+    mes = inicio.start_of("month")
+    while mes <= fim:
+        data_inicio = max(mes, inicio).format("DD/MM/YYYY")
+        data_fim = min(mes.end_of("month"), fim).format("DD/MM/YYYY")
+        params = {"data_assinatura_inicio": data_inicio, "data_assinatura_fim": data_fim}
+        total_paginas, total_registros = contar_paginas(config.api_url, params)
+        print(f"{data_inicio} a {data_fim}: {total_registros} registros em {total_paginas} paginas")
+
+        for pagina_inicio in range(1, max(total_paginas, 1) + 1, config.paginas_por_fatia):
+            pagina_fim = pagina_inicio + config.paginas_por_fatia - 1
+            fatias.append({
+                "numero": len(fatias),
+                "rotulo": f"{mes.format('YYYY-MM')} p{pagina_inicio}",
+                "data_inicio": data_inicio,
+                "data_fim": data_fim,
+                "pagina_inicio": pagina_inicio,
+                "pagina_fim": pagina_fim if pagina_fim < total_paginas else None,
+            })
+        mes = mes.add(months=1)
+
+    print(f"{len(fatias)} fatias planejadas ({config.paginas_por_fatia} paginas por fatia)")
+    return [{"fatia": fatia} for fatia in fatias]
+
+
+def coletar_preparar_fatia(config: ConfigEndpoint, fatia: dict, **context) -> None:
+    # Bruto e preparado sao gravados de forma atomica e com nome fixo por fatia,
+    # entao o retry de uma fatia refaz so ela.
+    caminho_bruto = caminho_intermediario(context, f"bruto_{fatia['numero']:05d}.ndjson")
+    caminho_preparado = caminho_intermediario(context, f"{PREFIXO_PREPARADO}{fatia['numero']:05d}")
+    params = {"data_assinatura_inicio": fatia["data_inicio"], "data_assinatura_fim": fatia["data_fim"]}
+
+    paginas = iterar_registros(
+        config.api_url,
+        params,
+        max_workers=MAX_WORKERS_COLETA,
+        pagina_inicio=fatia["pagina_inicio"],
+        pagina_fim=fatia["pagina_fim"],
+    )
+    total_bruto = gravar_ndjson(caminho_bruto, paginas)
+
+    lotes_preparados = (
+        preparar_registros(df, TIMEZONE)
+        for df in ler_ndjson_em_dataframes(caminho_bruto, config.esquema, TAMANHO_LOTE_PREPARO)
+    )
+    total = gravar_arrow(caminho_preparado, lotes_preparados)
+    print(f"Fatia {fatia['rotulo']}: {total_bruto} registros brutos, {total} preparados em {caminho_preparado}")
+
+
+def salvar_hdfs(config: ConfigEndpoint, **context) -> None:
+    diretorio = diretorio_execucao(context)
+    tabelas = [
+        ler_arrow(os.path.join(diretorio, nome))
+        for nome in sorted(os.listdir(diretorio))
+        if nome.startswith(PREFIXO_PREPARADO) and not nome.endswith(".parcial")
+    ]
+    tabelas = [tabela for tabela in tabelas if tabela.num_rows]
+
+    if not tabelas:
+        print("Nenhum registro processado para salvar no HDFS.")
+        return
+
+    df = unificar_tabelas(tabelas).to_pandas()
+    if "id" in df.columns:
+        # Paginas deslocadas por insercoes durante a coleta podem repetir registros entre fatias.
+        duplicados = df.duplicated("id", keep="last")
+        if duplicados.any():
+            print(f"{int(duplicados.sum())} registros repetidos entre fatias descartados.")
+            df = df[~duplicados]
+
+    client = criar_armazenamento(max_workers=MAX_WORKERS_ESCRITA)
+    resultados = salvar_particoes(client, df, config.hdfs_base_path, config.nome, schema=config.schema_parquet)
+
+    for resultado in resultados:
+        print(f"Grupo {resultado.caminho}: {resultado.registros} registros salvos no HDFS.")
+
+    print(f"Total de registros salvos no HDFS: {sum(resultado.registros for resultado in resultados)}")
+
+
+def criar_dag(config: ConfigEndpoint) -> DAG:
+    """Monta a DAG de um endpoint: periodo -> plano de fatias -> coleta mapeada -> escrita -> limpeza.
+
+    Cada fatia vira uma instancia de tarefa mapeada, que o scheduler distribui
+    entre os workers (ate ``MAX_FATIAS_SIMULTANEAS`` por execucao). Os
+    intermediarios ficam em ``DIRETORIO_INTERMEDIARIOS``, que precisa ser um
+    volume compartilhado quando houver mais de um worker.
+    """
+    with DAG(
+        dag_id=config.dag_id,
+        default_args=default_args,
+        description=f"Extrai {config.nome} do Ceara Transparente e grava no HDFS",
+        schedule=config.schedule,
+        start_date=config.start_date,
+        catchup=config.catchup,
+        tags=["ceara", config.nome, "hdfs"],
+    ) as dag:
+        task_definir_periodo_execucao = PythonOperator(
+            task_id="definir_periodo_execucao",
+            python_callable=partial(definir_periodo_execucao, config),
+        )
+
+        task_planejar_fatias = PythonOperator(
+            task_id="planejar_fatias",
+            python_callable=partial(planejar_fatias, config),
+        )
+
+        task_coletar_preparar = PythonOperator.partial(
+            task_id=f"coletar_preparar_{config.nome}",
+            python_callable=partial(coletar_preparar_fatia, config),
+            do_xcom_push=False,
+            max_active_tis_per_dagrun=MAX_FATIAS_SIMULTANEAS,
+            map_index_template="{{ task.op_kwargs['fatia']['rotulo'] }}",
+        ).expand(op_kwargs=task_planejar_fatias.output)
+
+        task_salvar_registros = PythonOperator(
+            task_id=f"salvar_{config.nome}_hdfs",
+            python_callable=partial(salvar_hdfs, config),
+            do_xcom_push=False,
+        )
+
+        task_limpar_intermediarios = PythonOperator(
+            task_id="limpar_intermediarios",
+            python_callable=limpar_intermediarios,
+            trigger_rule="all_done",
+            do_xcom_push=False,
+        )
+
+        (
+            task_definir_periodo_execucao
+            >> task_planejar_fatias
+            >> task_coletar_preparar
+            >> task_salvar_registros
+            >> task_limpar_intermediarios
+        )
+
+    return dag
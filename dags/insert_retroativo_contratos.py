@@ -1,114 +1,152 @@
-import pandas as pd
-import requests
-from io import BytesIO
-from hdfs import InsecureClient
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-import time
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from armazenamento import Armazenamento, criar_armazenamento
+from cliente_http import obter_cliente
+from coleta_paginada import coletar_paginas
+from escrita_particoes import MAX_WORKERS_ESCRITA, salvar_particoes
+from preparo import preparar_contratos
 
 # ----------------- CONFIGURAÇÕES -----------------
 API_URL = "https://api-dados-abertos.cearatransparente.ce.gov.br/transparencia/contratos/contratos"
-HDFS_URL = "http://host.docker.internal:9870"  
-HDFS_USER = "root"
 HDFS_BASE_PATH = "/contratos"
 TIMEZONE = "America/Fortaleza"
+MAX_WORKERS_COLETA = int(os.getenv("MAX_WORKERS_COLETA", "4"))
+MANIFESTO_PADRAO = "/tmp/carga_historica_contratos_manifesto.json"
 # -------------------------------------------------
 
-def converter_data_assinatura(datas: pd.Series) -> pd.Series:
-    datas_texto = datas.astype(str).str.strip()
-    data_convertida = pd.Series(pd.NaT, index=datas.index, dtype="datetime64[ns, UTC]")
-    formatos = ["%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%d %H:%M:%S%z", "%Y-%m-%d", "%d/%m/%Y"]
-    for formato in formatos:
-        mascara_pendente = data_convertida.isna()
-        if not mascara_pendente.any():
-            break
-        data_convertida.loc[mascara_pendente] = pd.to_datetime(
-            datas_texto.loc[mascara_pendente], format=formato, errors="coerce", utc=True
-        )
-    return data_convertida.dt.tz_convert(TIMEZONE)
-
 def coletar_contratos(data_inicio: str, data_fim: str) -> list[dict]:
-    session = requests.Session()
-    params = {"page": 1, "data_assinatura_inicio": data_inicio, "data_assinatura_fim": data_fim}
-    try:
-        response = session.get(API_URL, params=params, timeout=60)
-        response.raise_for_status()
-        payload = response.json()
-        summary = payload.get("sumary", {})
-        total_pages = int(summary.get("total_pages", 1))
-        registros = []
-        for page in range(1, total_pages + 1):
-            if page != 1:
-                params["page"] = page
-                page_response = session.get(API_URL, params=params, timeout=60)
-                page_response.raise_for_status()
-                payload = page_response.json()
-            page_data = payload.get("data", [])
-            if page_data:
-                registros.extend(page_data)
-        return registros
-    finally:
-        session.close()
-
-def preparar_contratos(registros: list[dict]) -> pd.DataFrame:
-    df = pd.DataFrame(registros)
-    if "data_assinatura" not in df.columns:
-        return pd.DataFrame()
-    df["data_assinatura_dt"] = converter_data_assinatura(df["data_assinatura"])
-    df = df.dropna(subset=["data_assinatura_dt"]).copy()
-    if df.empty:
-        return pd.DataFrame()
-    df["ano"] = df["data_assinatura_dt"].dt.strftime("%Y")
-    df["mes"] = df["data_assinatura_dt"].dt.strftime("%m")
-    df = df.drop(columns=["data_assinatura_dt"])
-    return df
-
-def salvar_grupo_no_hdfs(client: InsecureClient, df_mes: pd.DataFrame, ano: str, mes: str) -> None:
-    hdfs_path = f"{HDFS_BASE_PATH}/{ano}/{mes}/contratos_{ano}_{mes}.csv"
-    csv_bytes = df_mes.to_csv(index=False).encode("utf-8")
-    with BytesIO(csv_bytes) as reader:
-        client.write(hdfs_path, reader, overwrite=True)
-    print(f"Salvo no HDFS: {hdfs_path} ({len(df_mes)} registros)")
-
-def processar_carga_historica():
-    # (Jan/2025 até Mar/2026)
-    meses_para_processar = pd.date_range(start='2025-01-01', end='2026-03-01', freq='MS')
-    client = InsecureClient(HDFS_URL, user=HDFS_USER)
-
-    for data_inicio_mes in meses_para_processar:
-        # Pega o último dia do mês atual do loop
-        data_fim_mes = data_inicio_mes + pd.offsets.MonthEnd(1)
-        
-        # Se for março de 2026, trava no dia 16/03 
-        if data_fim_mes > pd.to_datetime('2026-03-16'):
-            data_fim_mes = pd.to_datetime('2026-03-16')
-
-        str_inicio = data_inicio_mes.strftime('%d/%m/%Y')
-        str_fim = data_fim_mes.strftime('%d/%m/%Y')
-
-        print(f"\n==============================================")
-        print(f"Iniciando coleta do periodo: {str_inicio} a {str_fim}")
-        
-        # 1. Coleta
-        registros_brutos = coletar_contratos(str_inicio, str_fim)
-        if not registros_brutos:
-            print("Sem dados neste período.")
-            continue
-            
-        # 2. Prepara
-        df_preparado = preparar_contratos(registros_brutos)
-        if df_preparado.empty:
-            print("Nenhum dado válido após preparação.")
+    params = {"data_assinatura_inicio": data_inicio, "data_assinatura_fim": data_fim}
+    return coletar_paginas(API_URL, params, max_workers=MAX_WORKERS_COLETA)
+
+def carregar_manifesto(caminho: str) -> dict:
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def registrar_mes_concluido(caminho: str, manifesto: dict, chave_mes: str, data_fim: str, total: int) -> None:
+    # Chamado so pela thread principal, no laco de as_completed; a troca atomica
+    # evita manifesto pela metade se o processo for interrompido na gravacao.
+    manifesto[chave_mes] = {
+        "data_fim": data_fim,
+        "registros": total,
+        "concluido_em": datetime.now().isoformat(timespec="seconds"),
+    }
+    caminho_tmp = f"{caminho}.tmp"
+    with open(caminho_tmp, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(caminho_tmp, caminho)
+
+def planejar_meses(inicio: pd.Timestamp, fim: pd.Timestamp) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    meses = []
+    for data_inicio_mes in pd.date_range(start=inicio.replace(day=1), end=fim, freq='MS'):
+        data_inicio_periodo = max(data_inicio_mes, inicio)
+        data_fim_periodo = min(data_inicio_mes + pd.offsets.MonthEnd(1), fim)
+        meses.append((data_inicio_periodo, data_fim_periodo))
+    return meses
+
+def mes_ja_concluido(manifesto: dict, chave_mes: str, data_fim: pd.Timestamp) -> bool:
+    # Um mes parcial (ex.: carga ate 16/03) so conta como concluido se cobriu o fim pedido agora.
+    registro = manifesto.get(chave_mes)
+    if not registro:
+        return False
+    return pd.to_datetime(registro["data_fim"], format='%d/%m/%Y') >= data_fim
+
+def processar_mes(client: Armazenamento, data_inicio: pd.Timestamp, data_fim: pd.Timestamp) -> int:
+    str_inicio = data_inicio.strftime('%d/%m/%Y')
+    str_fim = data_fim.strftime('%d/%m/%Y')
+    print(f"Iniciando coleta do periodo: {str_inicio} a {str_fim}")
+
+    # 1. Coleta
+    registros_brutos = coletar_contratos(str_inicio, str_fim)
+    if not registros_brutos:
+        print(f"Sem dados no período {str_inicio} a {str_fim}.")
+        return 0
+
+    # 2. Prepara
+    df_preparado = preparar_contratos(registros_brutos, TIMEZONE)
+    if df_preparado.empty:
+        print(f"Nenhum dado válido após preparação ({str_inicio} a {str_fim}).")
+        return 0
+
+    # 3. Salva no HDFS separando por ano/mês
+    salvar_particoes(client, df_preparado, HDFS_BASE_PATH, "contratos")
+
+    return len(df_preparado)
+
+def processar_carga_historica(
+    inicio: pd.Timestamp,
+    fim: pd.Timestamp,
+    workers: int = 3,
+    requisicoes_por_segundo: float = 5.0,
+    caminho_manifesto: str = MANIFESTO_PADRAO,
+    refazer: bool = False,
+) -> list[str]:
+    # O orcamento de requisicoes e global: todas as threads compartilham o mesmo
+    # limitador de taxa do cliente HTTP para o host da API.
+    obter_cliente().configurar_host(urlparse(API_URL).netloc, requisicoes_por_segundo)
+    client = criar_armazenamento(max_workers=workers * MAX_WORKERS_ESCRITA)
+    manifesto = {} if refazer else carregar_manifesto(caminho_manifesto)
+
+    pendentes = []
+    for data_inicio, data_fim in planejar_meses(inicio, fim):
+        chave_mes = data_inicio.strftime('%Y-%m')
+        if mes_ja_concluido(manifesto, chave_mes, data_fim):
+            print(f"{chave_mes}: ja concluido no manifesto, pulando.")
             continue
-            
-        # 3. Salva no HDFS separando por ano/mês
-        for (ano, mes), df_mes in df_preparado.groupby(["ano", "mes"], dropna=False):
-            df_saida = df_mes.drop(columns=["ano", "mes"])
-            salvar_grupo_no_hdfs(client, df_saida, str(ano), str(mes))
-            
-        # Pequena pausa para não derrubar a API com requisições seguidas
-        time.sleep(2)
+        pendentes.append((chave_mes, data_inicio, data_fim))
+
+    print(f"{len(pendentes)} meses a processar com {workers} workers ({requisicoes_por_segundo} req/s).")
+    falhas = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(processar_mes, client, data_inicio, data_fim): (chave_mes, data_fim)
+            for chave_mes, data_inicio, data_fim in pendentes
+        }
+        for future in as_completed(futures):
+            chave_mes, data_fim = futures[future]
+            try:
+                total = future.result()
+            except Exception as e:
+                print(f"{chave_mes}: falhou ({e}). Sera refeito na proxima execucao.")
+                falhas.append(chave_mes)
+                continue
+            registrar_mes_concluido(caminho_manifesto, manifesto, chave_mes, data_fim.strftime('%d/%m/%Y'), total)
+            print(f"{chave_mes}: concluido ({total} registros).")
+
+    if falhas:
+        print(f"\nCarga Histórica finalizada com falhas em: {', '.join(sorted(falhas))}")
+    else:
+        print("\nCarga Histórica Finalizada com Sucesso!")
+    return sorted(falhas)
 
-    print("\nCarga Histórica Finalizada com Sucesso!")
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Carga histórica de contratos do Ceará Transparente no HDFS.")
+    parser.add_argument("--inicio", required=True, help="Data inicial (YYYY-MM-DD).")
+    parser.add_argument("--fim", required=True, help="Data final, inclusive (YYYY-MM-DD).")
+    parser.add_argument("--workers", type=int, default=3, help="Meses processados em paralelo.")
+    parser.add_argument("--requisicoes-por-segundo", type=float, default=5.0, help="Orçamento global de requisições à API.")
+    parser.add_argument("--manifesto", default=MANIFESTO_PADRAO, help="Arquivo de checkpoint com os meses concluídos.")
+    parser.add_argument("--refazer", action="store_true", help="Ignora o manifesto e reprocessa todos os meses.")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    processar_carga_historica()
\ No newline at end of file
+    args = parse_args()
+    falhas = processar_carga_historica(
+        pd.to_datetime(args.inicio, format='%Y-%m-%d'),
+        pd.to_datetime(args.fim, format='%Y-%m-%d'),
+        workers=args.workers,
+        requisicoes_por_segundo=args.requisicoes_por_segundo,
+        caminho_manifesto=args.manifesto,
+        refazer=args.refazer,
+    )
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,125 @@
+from collections import defaultdict
+import os
+import re
+import shutil
+import time
+from typing import Iterable
+
+import pandas as pd
+import pyarrow as pa
+
+from esquemas import para_texto
+
+DIRETORIO_INTERMEDIARIOS = os.getenv("DIRETORIO_INTERMEDIARIOS", "/tmp/airflow_intermediarios")
+DIAS_RETENCAO_INTERMEDIARIOS = int(os.getenv("DIAS_RETENCAO_INTERMEDIARIOS", "3"))
+
+
+def diretorio_execucao(context: dict) -> str:
+    # Um diretorio por dag_id/run_id: execucoes sobrepostas nunca compartilham arquivos.
+    dag_id = context["dag_run"].dag_id
+    run_id = re.sub(r"[^A-Za-z0-9_.-]", "_", context["run_id"])
+    diretorio = os.path.join(DIRETORIO_INTERMEDIARIOS, dag_id, run_id)
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def caminho_intermediario(context: dict, nome: str) -> str:
+    return os.path.join(diretorio_execucao(context), nome)
+
+
+def tabela_de_dataframe(df: pd.DataFrame) -> pa.Table:
+    # Colunas com tipos misturados ou objetos aninhados viajam como texto (JSON),
+    # igual ao que ja acontecia no dump em JSON. So essas colunas sao copiadas.
+    convertidas = {}
+
+    for coluna in df.columns[df.dtypes == "object"]:
+        try:
+            tipo = pa.array(df[coluna], from_pandas=True).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            tipo = None
+        if tipo is None or pa.types.is_struct(tipo) or pa.types.is_list(tipo):
+            convertidas[coluna] = df[coluna].map(para_texto)
+
+    if convertidas:
+        df = df.assign(**convertidas)
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def gravar_arrow(caminho: str, partes: Iterable[pd.DataFrame]) -> int:
+    """Grava cada lote como um arquivo Arrow IPC em ``caminho/parte_NNNNN.arrow``.
+
+    O diretorio e montado em ``caminho.parcial`` e so renomeado no final, entao um
+    retry sempre reescreve a saida do zero.
+    """
+    caminho_parcial = f"{caminho}.parcial"
+    shutil.rmtree(caminho_parcial, ignore_errors=True)
+    os.makedirs(caminho_parcial)
+    total = 0
+
+    for numero, df in enumerate(partes):
+        if df.empty:
+            continue
+
+        tabela = tabela_de_dataframe(df)
+        with pa.OSFile(os.path.join(caminho_parcial, f"parte_{numero:05d}.arrow"), "wb") as sink:
+            with pa.ipc.new_file(sink, tabela.schema) as writer:
+                writer.write_table(tabela)
+        total += tabela.num_rows
+
+    shutil.rmtree(caminho, ignore_errors=True)
+    os.replace(caminho_parcial, caminho)
+    return total
+
+
+def ler_arrow(caminho: str) -> pa.Table:
+    tabelas = []
+
+    for nome in sorted(os.listdir(caminho)):
+        if nome.endswith(".arrow"):
+            # memory_map: os buffers da tabela apontam direto para o arquivo, sem copia.
+            tabelas.append(pa.ipc.open_file(pa.memory_map(os.path.join(caminho, nome), "r")).read_all())
+
+    if not tabelas:
+        return pa.table({})
+
+    return unificar_tabelas(tabelas)
+
+
+def unificar_tabelas(tabelas: list[pa.Table]) -> pa.Table:
+    try:
+        return pa.concat_tables(tabelas, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    # Colunas que chegaram com tipos incompativeis em lotes diferentes viram texto.
+    tipos = defaultdict(set)
+    for tabela in tabelas:
+        for campo in tabela.schema:
+            if not pa.types.is_null(campo.type):
+                tipos[campo.name].add(campo.type)
+    conflitantes = {nome for nome, tipos_coluna in tipos.items() if len(tipos_coluna) > 1}
+
+    tabelas_texto = []
+    for tabela in tabelas:
+        for nome in conflitantes & set(tabela.column_names):
+            indice = tabela.column_names.index(nome)
+            tabela = tabela.set_column(indice, nome, tabela.column(nome).cast(pa.string()))
+        tabelas_texto.append(tabela)
+
+    return pa.concat_tables(tabelas_texto, promote_options="permissive")
+
+
+def limpar_intermediarios(**context) -> None:
+    diretorio = diretorio_execucao(context)
+    shutil.rmtree(diretorio, ignore_errors=True)
+    print(f"Intermediarios removidos: {diretorio}")
+
+    # Execucoes que morreram antes da limpeza deixam diretorios para tras.
+    raiz_dag = os.path.dirname(diretorio)
+    limite = time.time() - DIAS_RETENCAO_INTERMEDIARIOS * 86400
+    for nome in os.listdir(raiz_dag):
+        caminho = os.path.join(raiz_dag, nome)
+        if os.path.isdir(caminho) and os.path.getmtime(caminho) < limite:
+            shutil.rmtree(caminho, ignore_errors=True)
+            print(f"Intermediarios antigos removidos: {caminho}")
@@ -0,0 +1,281 @@
+"""
+Leitura das particoes ``{base}/{ano}/{mes}/{prefixo}_{ano}_{mes}.{formato}`` gravadas pelas DAGs.
+Execução: python dags/leitura_particoes.py /contratos --inicio 2024-01-01 --fim 2024-06-30 \
+    --colunas id,valor_contrato --filtro "valor_contrato>=100000" > saida.csv
+"""
+
+import argparse
+from dataclasses import asdict
+from io import BytesIO
+import re
+import sys
+from typing import Iterator
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from armazenamento import Armazenamento, criar_armazenamento
+from datas import TIMEZONE_PADRAO, converter_datas
+from escrita_particoes import FORMATO_SAIDA, caminho_particao
+from manifestos import ManifestoParticao, ler_manifesto
+
+TAMANHO_LOTE_LEITURA = 50_000
+COLUNA_DATA = "data_assinatura"
+OPERADORES = ("==", "!=", "<", "<=", ">", ">=", "in", "not in")
+
+Filtro = tuple[str, str, object]
+
+
+def listar_particoes(
+    client: Armazenamento,
+    base_path: str,
+    prefixo: str | None = None,
+    inicio=None,
+    fim=None,
+    formato: str = FORMATO_SAIDA,
+) -> list[tuple[str, str, str]]:
+    """Devolve ``(ano, mes, caminho)`` das particoes existentes entre ``inicio`` e ``fim``.
+
+    So os diretorios de ano e mes sao listados; meses fora do intervalo nunca sao abertos.
+    """
+    prefixo = prefixo or base_path.rstrip("/").rsplit("/", 1)[-1]
+    mes_inicio = _mes(inicio) if inicio is not None else None
+    mes_fim = _mes(fim) if fim is not None else None
+    particoes = []
+
+    for ano in sorted(_subdiretorios(client, base_path)):
+        if (mes_inicio and ano < mes_inicio[0]) or (mes_fim and ano > mes_fim[0]):
+            continue
+        for mes in sorted(_subdiretorios(client, f"{base_path}/{ano}")):
+            if (mes_inicio and (ano, mes) < mes_inicio) or (mes_fim and (ano, mes) > mes_fim):
+                continue
+            caminho = caminho_particao(base_path, prefixo, ano, mes, formato)
+            if client.status(caminho, strict=False) is not None:
+                particoes.append((ano, mes, caminho))
+
+    return particoes
+
+
+def ler_particoes(
+    client: Armazenamento,
+    base_path: str,
+    prefixo: str | None = None,
+    inicio=None,
+    fim=None,
+    colunas: list[str] | None = None,
+    filtros: list[Filtro] | None = None,
+    formato: str = FORMATO_SAIDA,
+    tamanho_lote: int = TAMANHO_LOTE_LEITURA,
+) -> Iterator[pd.DataFrame]:
+    """Le as particoes do intervalo em lotes de ate ``tamanho_lote`` linhas.
+
+    ``inicio`` e ``fim`` sao dias inclusivos comparados com ``data_assinatura``; os meses
+    das pontas tambem sao filtrados por linha. ``filtros`` segue o formato do pyarrow,
+    ``[("valor_contrato", ">=", 1000), ("isn_sic", "in", [1, 2])]``, todos combinados
+    com E. So ``colunas`` sao devolvidas, mas as usadas nos filtros tambem sao lidas.
+    """
+    filtros = list(filtros or [])
+    for coluna, operador, _ in filtros:
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador nao suportado no filtro de {coluna}: {operador}")
+
+    if inicio is not None:
+        filtros.append((COLUNA_DATA, ">=", _dia(inicio)))
+    if fim is not None:
+        filtros.append((COLUNA_DATA, "<", _dia(fim) + pd.Timedelta(days=1)))
+
+    colunas_lidas = None
+    if colunas is not None:
+        colunas_lidas = list(dict.fromkeys([*colunas, *(coluna for coluna, _, _ in filtros)]))
+
+    for _, _, caminho in listar_particoes(client, base_path, prefixo, inicio, fim, formato):
+        if filtros and _descartada_pelo_manifesto(ler_manifesto(client, caminho), filtros):
+            continue
+        lotes = _ler_parquet if formato == "parquet" else _ler_csv
+
+        for df in lotes(client, caminho, colunas_lidas, filtros, tamanho_lote):
+            if colunas is not None:
+                # Sem esquema fixo (contratos), um mes pode nao ter a coluna: ela volta nula.
+                df = df.reindex(columns=colunas)
+            if not df.empty:
+                yield df.reset_index(drop=True)
+
+
+def ler_intervalo(client: Armazenamento, base_path: str, **kwargs) -> pd.DataFrame:
+    lotes = list(ler_particoes(client, base_path, **kwargs))
+    if not lotes:
+        return pd.DataFrame(columns=kwargs.get("colunas"))
+    return pd.concat(lotes, ignore_index=True)
+
+
+def resumir_particoes(client: Armazenamento, base_path: str, **kwargs) -> pd.DataFrame:
+    """Uma linha por particao do intervalo, montada so a partir dos manifestos."""
+    linhas = []
+
+    for ano, mes, caminho in listar_particoes(client, base_path, **kwargs):
+        manifesto = ler_manifesto(client, caminho)
+        linhas.append({"ano": ano, "mes": mes, **(asdict(manifesto) if manifesto else {"caminho": caminho})})
+
+    return pd.DataFrame(linhas)
+
+
+def _descartada_pelo_manifesto(manifesto: ManifestoParticao | None, filtros: list[Filtro]) -> bool:
+    if manifesto is None:
+        return False
+
+    for coluna, operador, valor in filtros:
+        if coluna not in manifesto.colunas:
+            return True
+        if coluna != COLUNA_DATA or not isinstance(valor, pd.Timestamp) or manifesto.data_assinatura_min is None:
+            continue
+
+        minimo = pd.Timestamp(manifesto.data_assinatura_min)
+        maximo = pd.Timestamp(manifesto.data_assinatura_max)
+        if (
+            (operador == ">=" and maximo < valor) or (operador == ">" and maximo <= valor)
+            or (operador == "<" and minimo >= valor) or (operador == "<=" and minimo > valor)
+        ):
+            return True
+
+    return False
+
+
+def _ler_parquet(
+    client: Armazenamento, caminho: str, colunas: list[str] | None, filtros: list[Filtro], tamanho_lote: int
+) -> Iterator[pd.DataFrame]:
+    # O Parquet precisa de acesso aleatorio ao rodape: o arquivo vem inteiro, mas so as
+    # colunas pedidas sao descomprimidas e os filtros descartam row groups pelas estatisticas.
+    with client.read(caminho) as reader:
+        arquivo = BytesIO(reader.read())
+
+    existentes = pq.read_schema(arquivo).names
+    if any(coluna not in existentes for coluna, _, _ in filtros):
+        return
+    if colunas is not None:
+        colunas = [coluna for coluna in colunas if coluna in existentes]
+
+    tabela = pq.read_table(arquivo, columns=colunas, filters=filtros or None)
+    for lote in tabela.to_batches(max_chunksize=tamanho_lote):
+        yield lote.to_pandas()
+
+
+def _ler_csv(
+    client: Armazenamento, caminho: str, colunas: list[str] | None, filtros: list[Filtro], tamanho_lote: int
+) -> Iterator[pd.DataFrame]:
+    # O CSV e lido direto do stream da resposta, um lote por vez.
+    with client.read(caminho) as reader:
+        lotes = pd.read_csv(
+            reader,
+            dtype=str,
+            keep_default_na=False,
+            na_values=[""],
+            usecols=(lambda coluna: coluna in colunas) if colunas is not None else None,
+            chunksize=tamanho_lote,
+        )
+        for df in lotes:
+            yield _aplicar_filtros(df, filtros)
+
+
+def _aplicar_filtros(df: pd.DataFrame, filtros: list[Filtro]) -> pd.DataFrame:
+    mascara = pd.Series(True, index=df.index)
+
+    for coluna, operador, valor in filtros:
+        if coluna not in df.columns:
+            # Coluna ausente na particao equivale a valores nulos: nenhum filtro passa.
+            return df.iloc[:0]
+        serie = _serie_comparavel(df[coluna], valor)
+
+        if operador == "in":
+            mascara &= serie.isin(valor)
+        elif operador == "not in":
+            mascara &= ~serie.isin(valor) & serie.notna()
+        else:
+            comparacao = {
+                "==": serie.__eq__, "!=": serie.__ne__, "<": serie.__lt__,
+                "<=": serie.__le__, ">": serie.__gt__, ">=": serie.__ge__,
+            }[operador](valor)
+            mascara &= comparacao.fillna(False).astype(bool) & serie.notna()
+
+    return df[mascara]
+
+
+def _serie_comparavel(serie: pd.Series, valor) -> pd.Series:
+    # No CSV tudo chega como texto: a coluna e convertida para o tipo do valor do filtro.
+    exemplo = next(iter(valor), None) if isinstance(valor, (list, tuple, set)) else valor
+
+    if isinstance(exemplo, pd.Timestamp):
+        if isinstance(serie.dtype, pd.DatetimeTZDtype):
+            return serie
+        return converter_datas(serie)
+    if isinstance(exemplo, (int, float)) and not isinstance(exemplo, bool) and not pd.api.types.is_numeric_dtype(serie):
+        return pd.to_numeric(serie, errors="coerce")
+    return serie
+
+
+def _dia(valor) -> pd.Timestamp:
+    data = pd.Timestamp(valor)
+    if data.tzinfo is None:
+        data = data.tz_localize(TIMEZONE_PADRAO)
+    return data.tz_convert(TIMEZONE_PADRAO).normalize()
+
+
+def _mes(valor) -> tuple[str, str]:
+    data = _dia(valor)
+    return str(data.year), f"{data.month:02d}"
+
+
+def _subdiretorios(client: Armazenamento, caminho: str) -> list[str]:
+    if client.status(caminho, strict=False) is None:
+        return []
+    return [nome for nome, status in client.list(caminho, status=True) if status["type"] == "DIRECTORY"]
+
+
+def _ler_filtro(texto: str) -> Filtro:
+    match = re.fullmatch(r"\s*(\w+)\s*(==|!=|<=|>=|<|>)\s*(.+?)\s*", texto)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Filtro invalido: {texto!r} (use coluna<op>valor)")
+
+    coluna, operador, valor = match.groups()
+    try:
+        valor = float(valor) if "." in valor else int(valor)
+    except ValueError:
+        pass
+    return coluna, operador, valor
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Le particoes ano/mes e escreve CSV na saida padrao.")
+    parser.add_argument("base_path", help="Ex.: /contratos ou /convenios")
+    parser.add_argument("--prefixo", help="Prefixo dos arquivos (padrao: ultimo trecho do base_path)")
+    parser.add_argument("--inicio", help="Primeiro dia (YYYY-MM-DD), inclusivo")
+    parser.add_argument("--fim", help="Ultimo dia (YYYY-MM-DD), inclusivo")
+    parser.add_argument("--colunas", type=lambda texto: texto.split(","), help="Lista separada por virgulas")
+    parser.add_argument("--filtro", type=_ler_filtro, action="append", default=[], help="Ex.: valor_contrato>=1000")
+    parser.add_argument("--formato", default=FORMATO_SAIDA)
+    parser.add_argument("--manifestos", action="store_true", help="Lista os manifestos das particoes, sem ler os dados")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cabecalho = True
+
+    if args.manifestos:
+        resumo = resumir_particoes(
+            criar_armazenamento(), args.base_path, prefixo=args.prefixo, inicio=args.inicio, fim=args.fim, formato=args.formato
+        )
+        resumo.to_csv(sys.stdout, index=False)
+        sys.exit(0)
+
+    for df in ler_particoes(
+        criar_armazenamento(),
+        args.base_path,
+        prefixo=args.prefixo,
+        inicio=args.inicio,
+        fim=args.fim,
+        colunas=args.colunas,
+        filtros=args.filtro,
+        formato=args.formato,
+    ):
+        df.to_csv(sys.stdout, index=False, header=cabecalho)
+        cabecalho = False
@@ -0,0 +1,83 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import json
+import posixpath
+
+import pandas as pd
+
+from armazenamento import Armazenamento
+
+COLUNA_DATA_MANIFESTO = "data_assinatura"
+
+
+@dataclass
+class ManifestoParticao:
+    """Metadados de um arquivo de particao, gravados ao lado dele a cada escrita."""
+
+    caminho: str
+    formato: str
+    registros: int
+    bytes: int
+    sha256: str
+    colunas: list[str]
+    data_assinatura_min: str | None
+    data_assinatura_max: str | None
+    atualizado_em: str
+    hash_registros: str | None = None
+
+
+def caminho_manifesto(caminho_particao: str) -> str:
+    # O prefixo "_" faz Hive/Spark ignorarem o arquivo ao ler o diretorio da particao.
+    diretorio, nome = posixpath.split(caminho_particao)
+    return f"{diretorio}/_manifesto_{nome}.json"
+
+
+def montar_manifesto(
+    caminho: str,
+    formato: str,
+    registros: int,
+    colunas: list[str],
+    bytes_arquivo: int,
+    sha256: str,
+    datas: pd.Series | None = None,
+    hash_registros: str | None = None,
+) -> ManifestoParticao:
+    data_min = data_max = None
+    if datas is not None and datas.notna().any():
+        data_min = datas.min().isoformat()
+        data_max = datas.max().isoformat()
+
+    return ManifestoParticao(
+        caminho=caminho,
+        formato=formato,
+        registros=registros,
+        bytes=bytes_arquivo,
+        sha256=sha256,
+        colunas=[str(coluna) for coluna in colunas],
+        data_assinatura_min=data_min,
+        data_assinatura_max=data_max,
+        atualizado_em=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        hash_registros=hash_registros,
+    )
+
+
+def gravar_manifesto(client: Armazenamento, manifesto: ManifestoParticao) -> None:
+    client.write(
+        caminho_manifesto(manifesto.caminho),
+        data=json.dumps(asdict(manifesto), ensure_ascii=False, indent=2),
+        encoding="utf-8",
+        overwrite=True,
+    )
+
+
+def ler_manifesto(client: Armazenamento, caminho_particao: str) -> ManifestoParticao | None:
+    caminho = caminho_manifesto(caminho_particao)
+    if client.status(caminho, strict=False) is None:
+        return None
+
+    with client.read(caminho, encoding="utf-8") as reader:
+        try:
+            return ManifestoParticao(**json.load(reader))
+        except (json.JSONDecodeError, TypeError):
+            print(f"Manifesto ilegivel em {caminho}; ignorando.")
+            return None
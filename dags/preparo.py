@@ -0,0 +1,49 @@
+"""
+Preparo dos lotes antes da escrita: data de assinatura convertida e colunas de particao ano/mes.
+Sem dependencia do Airflow, para ser usado pelas DAGs, pela carga historica e pelos benchmarks.
+"""
+
+import pandas as pd
+
+from datas import TIMEZONE_PADRAO, converter_data_assinatura
+from esquemas import ESQUEMA_CONTRATOS
+
+
+def preparar_registros(df: pd.DataFrame, timezone: str = TIMEZONE_PADRAO) -> pd.DataFrame:
+    """Recebe o lote ja tipado pelo esquema e acrescenta as colunas de particao ano/mes."""
+    if df.empty:
+        print("Nenhum registro encontrado para processar.")
+        return pd.DataFrame()
+
+    if "data_assinatura" not in df.columns:
+        raise ValueError("A coluna 'data_assinatura' nao foi encontrada nos dados.")
+
+    df["data_assinatura_dt"] = converter_data_assinatura(df["data_assinatura"], timezone)
+    df = df.dropna(subset=["data_assinatura_dt"]).copy()
+
+    if df.empty:
+        print("Nenhum registro com data_assinatura valida para salvar.")
+        return pd.DataFrame()
+
+    df["ano"] = df["data_assinatura_dt"].dt.strftime("%Y")
+    df["mes"] = df["data_assinatura_dt"].dt.strftime("%m")
+    print(
+        "Amostra de ano/mes extraidos:",
+        df[["data_assinatura", "ano", "mes"]].head(10).to_dict(orient="records"),
+    )
+
+    return df.drop(columns=["data_assinatura_dt"])
+
+
+def preparar_contratos(registros: list[dict], timezone: str = TIMEZONE_PADRAO) -> pd.DataFrame:
+    df = ESQUEMA_CONTRATOS.dataframe(registros)
+    if "data_assinatura" not in df.columns:
+        return pd.DataFrame()
+    df["data_assinatura_dt"] = converter_data_assinatura(df["data_assinatura"], timezone)
+    df = df.dropna(subset=["data_assinatura_dt"]).copy()
+    if df.empty:
+        return pd.DataFrame()
+    df["ano"] = df["data_assinatura_dt"].dt.strftime("%Y")
+    df["mes"] = df["data_assinatura_dt"].dt.strftime("%m")
+    df = df.drop(columns=["data_assinatura_dt"])
+    return df
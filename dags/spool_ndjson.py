@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+import json
+import os
+from typing import Iterable, Iterator, TextIO
+
+import pandas as pd
+
+from esquemas import Esquema
+
+TAMANHO_LOTE_PADRAO = 5000
+
+
+@contextmanager
+def abrir_spool(caminho: str) -> Iterator[TextIO]:
+    # Escreve em um arquivo parcial e so publica no caminho final ao terminar,
+    # para que um retry nunca leia um spool pela metade.
+    caminho_parcial = f"{caminho}.parcial"
+
+    try:
+        with open(caminho_parcial, "w", encoding="utf-8") as arquivo:
+            yield arquivo
+    except BaseException:
+        if os.path.exists(caminho_parcial):
+            os.remove(caminho_parcial)
+        raise
+
+    os.replace(caminho_parcial, caminho)
+
+
+def escrever_registros(arquivo: TextIO, registros: Iterable[dict]) -> int:
+    total = 0
+
+    for registro in registros:
+        arquivo.write(json.dumps(registro, ensure_ascii=False, default=str))
+        arquivo.write("\n")
+        total += 1
+
+    return total
+
+
+def gravar_ndjson(caminho: str, paginas: Iterable[list[dict]]) -> int:
+    total = 0
+
+    with abrir_spool(caminho) as arquivo:
+        for registros in paginas:
+            total += escrever_registros(arquivo, registros)
+
+    return total
+
+
+def ler_ndjson_em_lotes(caminho: str, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> Iterator[list[dict]]:
+    lote = []
+
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if not linha:
+                continue
+
+            lote.append(json.loads(linha))
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+
+    if lote:
+        yield lote
+
+
+def ler_ndjson_em_dataframes(
+    caminho: str, esquema: Esquema, tamanho_lote: int = TAMANHO_LOTE_PADRAO
+) -> Iterator[pd.DataFrame]:
+    # Cada lote vira um DataFrame tipado antes do proximo ser lido: so um lote de
+    # dicts fica em memoria, e campos fora do esquema nunca chegam ao DataFrame.
+    for lote in ler_ndjson_em_lotes(caminho, tamanho_lote):
+        yield esquema.dataframe(lote)
+
+
+def carregar_ndjson(caminho: str) -> list[dict]:
+    registros = []
+
+    for lote in ler_ndjson_em_lotes(caminho):
+        registros.extend(lote)
+
+    return registros
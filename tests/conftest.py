@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+# As DAGs importam os módulos vizinhos pelo nome, como no dags_folder do Airflow.
+for pasta in ("dags", "benchmarks", "aula11"):
+    sys.path.insert(0, str(RAIZ / pasta))
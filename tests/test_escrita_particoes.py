@@ -0,0 +1,29 @@
+import pandas as pd
+
+from escrita_particoes import hash_registros
+
+
+def test_hash_ignora_dtype_fisico():
+    # Mesmos registros como chegam da carga historica (texto) e da DAG (tipados pelo esquema).
+    textos = pd.DataFrame({
+        "id": ["1", "2"],
+        "descricao_objeto": ["Aquisicao de material", None],
+        "valor_contrato": ["100.5", "200"],
+        "data_assinatura": ["2024-01-10T00:00:00+00:00", "2024-01-20T12:00:00+00:00"],
+    })
+    tipados = pd.DataFrame({
+        "id": pd.array([1, 2], dtype="Int64"),
+        "descricao_objeto": pd.array(["Aquisicao de material", None], dtype="string[pyarrow]"),
+        "valor_contrato": [100.5, 200.0],
+        "data_assinatura": pd.to_datetime(["2024-01-10 00:00", "2024-01-20 12:00"]).tz_localize("UTC"),
+    })
+    sem_timezone = tipados.assign(data_assinatura=tipados["data_assinatura"].dt.tz_localize(None))
+
+    assert hash_registros(textos) == hash_registros(tipados) == hash_registros(sem_timezone)
+
+
+def test_hash_muda_com_o_conteudo():
+    df = pd.DataFrame({"id": ["1", "2"], "valor_contrato": ["100.5", "200"]})
+
+    assert hash_registros(df) != hash_registros(df.assign(valor_contrato=["100.5", "201"]))
+    assert hash_registros(df) == hash_registros(df.iloc[::-1])
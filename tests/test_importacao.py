@@ -0,0 +1,43 @@
+"""
+Importa cada módulo das DAGs e dos benchmarks: um nome removido num módulo e ainda
+importado por outro quebra aqui, e não só no parse das DAGs pelo Airflow.
+"""
+
+import importlib
+
+import pytest
+
+# Módulo -> dependências opcionais sem as quais o import não é testado.
+MODULOS = {
+    "armazenamento": (),
+    "cache_http": (),
+    "cliente_http": (),
+    "coleta_paginada": (),
+    "datas": (),
+    "escrita_particoes": (),
+    "esquemas": (),
+    "intermediarios": (),
+    "leitura_particoes": (),
+    "manifestos": (),
+    "preparo": (),
+    "spool_ndjson": (),
+    "insert_retroativo_contratos": (),
+    "fabrica_dags": ("airflow",),
+    "dag_api_contratos": ("airflow",),
+    "dag_api_convenios": ("airflow",),
+    "dag_compactacao_hadoop": ("airflow",),
+    "dag_exemplo_hadoop": ("airflow",),
+    "bench_datas": (),
+    "bench_escrita": (),
+    "bench_transformacoes": (),
+    "motor_llm": ("openai",),
+    "classificador_local": ("sklearn",),
+    "aula11": ("openai", "psycopg2", "sklearn"),
+}
+
+
+@pytest.mark.parametrize("modulo", MODULOS)
+def test_modulo_importa(modulo):
+    for dependencia in MODULOS[modulo]:
+        pytest.importorskip(dependencia)
+    importlib.import_module(modulo)
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from armazenamento import ArmazenamentoLocal
+from escrita_particoes import salvar_grupo_no_hdfs
+from leitura_particoes import ler_intervalo
+
+
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_colunas_ausentes_em_um_mes_voltam_nulas(tmp_path, formato):
+    client = ArmazenamentoLocal(str(tmp_path))
+    janeiro = pd.DataFrame({
+        "id": ["1", "2"],
+        "data_assinatura": ["2024-01-10T00:00:00.000-03:00", "2024-01-20T00:00:00.000-03:00"],
+        "valor_contrato": ["100.5", "200.0"],
+    })
+    # Fevereiro chegou da API sem valor_contrato e com um campo novo.
+    fevereiro = pd.DataFrame({
+        "id": ["3"],
+        "data_assinatura": ["2024-02-05T00:00:00.000-03:00"],
+        "modalidade": ["Dispensa"],
+    })
+    for mes, df_mes in (("01", janeiro), ("02", fevereiro)):
+        salvar_grupo_no_hdfs(client, df_mes, "/contratos", "contratos", "2024", mes, formato)
+
+    df = ler_intervalo(
+        client, "/contratos", inicio="2024-01-01", fim="2024-02-29",
+        colunas=["id", "valor_contrato", "modalidade"], formato=formato,
+    )
+
+    assert list(df.columns) == ["id", "valor_contrato", "modalidade"]
+    assert df["id"].astype(str).tolist() == ["1", "2", "3"]
+    assert df["valor_contrato"].isna().tolist() == [False, False, True]
+    assert df["modalidade"].isna().tolist() == [True, True, False]